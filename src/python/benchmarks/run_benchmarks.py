@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# without the js side, pid_analyzer.status reports to logging.debug instead of js_status.reportStatusToJs
+from pid_analyzer import CSV_log, Trace, set_profiling
+from pid_analyzer.profiling import profiler
+from synthetic_log import AXES, write_synthetic_log
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+FINGERPRINT_SAMPLES = 16
+BASELINE_RTOL = 1e-6        # relative to the largest magnitude of each array
+FLOAT32_RTOL = 1e-3         # float32 results against float64 ones, relative to the largest magnitude of each array
+LATENCY_TOLERANCE = 0.002   # s
+NOISE_PEAK_MIN_HZ = 100.    # the noise peak is searched above the step response content
+
+
+def case_name(rate, duration, columns, seed):
+    return 'rate=%d,duration=%g,columns=%s,seed=%d' % (rate, duration, columns, seed)
+
+def prepare_log(workdir, rate, duration, columns, seed):
+    ### generated logs are kept in workdir, long ones take a while to write
+    path = os.path.join(workdir, case_name(rate, duration, columns, seed).replace(',', '_') + '.csv')
+    meta_path = path[:-4] + '.json'
+    if not (os.path.exists(path) and os.path.exists(meta_path)):
+        logging.info('writing %s', path)
+        meta = write_synthetic_log(path, rate, duration, columns, seed)
+        with open(meta_path, 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file)
+    with open(meta_path, 'r', encoding='utf-8') as meta_file:
+        return path, json.load(meta_file)
+
+async def async_run_pipeline(path, header, parallel, precision='float64', chunk_rows=None):
+    ### the steps of CSV_log.async_init, each one measured on its own. returns the result objects per axis
+    log = CSV_log(path, dict(header), None, 'json', parallel=parallel, precision=precision, chunk_rows=chunk_rows)
+    if chunk_rows is not None:
+        return await async_run_chunked_pipeline(log)
+    with profiler.stage('async_readcsv'):
+        log.data = await log.async_readcsv(log.file)
+    log.traces = log.find_traces(log.data)
+
+    traces = {}
+    if parallel:
+        with profiler.stage('trace_async_init'):
+            loop = asyncio.get_running_loop()
+            pending = [loop.run_in_executor(None, CSV_log.analyze_trace, trace_data) for trace_data in log.traces]
+            for trace_data, pending_trace in zip(log.traces, pending):
+                traces[trace_data['name']] = await pending_trace
+    else:
+        for trace_data in log.traces:
+            trace = Trace(trace_data)
+            with profiler.stage('trace_async_init'):
+                await trace.async_init()
+            traces[trace_data['name']] = trace
+
+    results = {}
+    for name, trace in traces.items():
+        results[name] = trace.to_result_object()
+        with profiler.stage('json_export'):
+            log.write_result('trace_' + name, results[name])
+    return results
+
+async def async_run_chunked_pipeline(log):
+    ### the steps of CSV_log.async_init for logs read in blocks (see CSV_log.async_analyze_chunked)
+    with profiler.stage('async_readcsv'):
+        traces = await log.async_readcsv_chunked(log.file)
+
+    results = {}
+    for trace in traces:
+        with profiler.stage('trace_async_init'):
+            await trace.async_finish()
+        results[trace.name] = trace.to_result_object()
+        with profiler.stage('json_export'):
+            log.write_result('trace_' + trace.name, results[trace.name])
+    return results
+
+def run_case(path, header, parallel, memory, precision='float64', chunk_rows=None):
+    set_profiling(True, memory)
+    start = time.perf_counter()
+    results = asyncio.run(async_run_pipeline(path, header, parallel, precision, chunk_rows))
+    wall = time.perf_counter() - start
+    report = profiler.report()
+    set_profiling(False)
+    return results, wall, report['stages']
+
+def fingerprint(value):
+    ### compact stand-in of a result for the baseline: shape, sum and evenly spaced samples of every array
+    if isinstance(value, dict):
+        return {key: fingerprint(entry) for key, entry in value.items()}
+    if isinstance(value, np.ndarray):
+        flat = value.ravel().astype(np.float64)
+        samples = flat[np.linspace(0, len(flat) - 1, min(FINGERPRINT_SAMPLES, len(flat))).astype(int)] \
+            if len(flat) else flat
+        return {
+            'shape': list(value.shape),
+            'sum': float(np.nansum(flat)),
+            'scale': float(np.nanmax(np.abs(flat))) if len(flat) else 0.,
+            'samples': samples.tolist(),
+        }
+    if isinstance(value, (np.floating, np.integer)):
+        return value.item()
+    return value
+
+def compare_fingerprints(expected, actual, path='', rtol=BASELINE_RTOL):
+    ### lists the differences between two fingerprints, arrays are compared relative to their scale
+    if isinstance(expected, dict) and 'shape' in expected and 'samples' in expected:
+        if not isinstance(actual, dict) or actual.get('shape') != expected['shape']:
+            return ['%s: shape %s != %s' % (path, actual.get('shape') if isinstance(actual, dict) else actual,
+                                          expected['shape'])]
+        tolerance = rtol * max(expected['scale'], 1e-12)
+        sum_tolerance = tolerance * max(int(np.prod(expected['shape'])), 1)
+        differences = []
+        if not np.allclose(actual['samples'], expected['samples'], rtol=0., atol=tolerance, equal_nan=True):
+            differences.append('%s: samples differ by %g (tolerance %g)' % (
+                path, np.nanmax(np.abs(np.subtract(actual['samples'], expected['samples']))), tolerance))
+        if not np.isclose(actual['sum'], expected['sum'], rtol=0., atol=sum_tolerance, equal_nan=True):
+            differences.append('%s: sum %r != %r' % (path, actual['sum'], expected['sum']))
+        return differences
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return ['%s: missing' % path]
+        differences = []
+        for key in expected:
+            if key not in actual:
+                differences.append('%s/%s: missing' % (path, key))
+            else:
+                differences += compare_fingerprints(expected[key], actual[key], '%s/%s' % (path, key), rtol)
+        return differences
+    if isinstance(expected, float) or isinstance(actual, float):
+        if not np.isclose(actual, expected, rtol=rtol, atol=rtol, equal_nan=True):
+            return ['%s: %r != %r' % (path, actual, expected)]
+        return []
+    return [] if actual == expected else ['%s: %r != %r' % (path, actual, expected)]
+
+def compare_results(expected, actual, path='', rtol=FLOAT32_RTOL):
+    ### lists the differences between two complete results, arrays are compared relative to their scale
+    if isinstance(expected, dict):
+        differences = []
+        for key in expected:
+            if key not in actual:
+                differences.append('%s/%s: missing' % (path, key))
+            else:
+                differences += compare_results(expected[key], actual[key], '%s/%s' % (path, key), rtol)
+        return differences
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if expected.shape != actual.shape:
+        return ['%s: shape %s != %s' % (path, list(actual.shape), list(expected.shape))]
+    if expected.size == 0:
+        return []
+    tolerance = rtol * max(float(np.nanmax(np.abs(expected))), 1e-12)
+    deviation = float(np.nanmax(np.abs(actual - expected)))
+    if deviation > tolerance or not np.array_equal(np.isnan(actual), np.isnan(expected)):
+        return ['%s: differs by %g (tolerance %g)' % (path, deviation, tolerance)]
+    return []
+
+def check_truth(results, truth):
+    ### compares the analysis with the known answers of the synthetic log
+    failures = []
+    for axis in AXES:
+        latency = results[axis]['delay']['latency_half_height']
+        if abs(latency - truth['latency_half_height']) > LATENCY_TOLERANCE:
+            failures.append('%s: latency %.4f s, expected %.4f s' % (axis, latency, truth['latency_half_height']))
+
+        noise = results[axis]['noise_gyro']
+        spectrum = np.asarray(noise['hist2d_sm']).sum(axis=1)
+        freq = np.asarray(noise['freq_axis'])[:len(spectrum)]
+        spectrum[freq < NOISE_PEAK_MIN_HZ] = 0.
+        peak = freq[np.argmax(spectrum)]
+        resolution = freq[1] - freq[0]
+        if abs(peak - truth['gyro_noise_hz'][axis]) > 1.5 * resolution:
+            failures.append('%s: gyro noise peak at %.1f Hz, expected %.1f Hz' % (axis, peak, truth['gyro_noise_hz'][axis]))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the analysis on synthetic logs and checks its results.')
+    parser.add_argument('-r', '--rates', type=int, nargs='+', default=[2000], help='loop rates in Hz (1000-8000)')
+    parser.add_argument('-d', '--durations', type=float, nargs='+', default=[30.], help='durations in s (30-1200)')
+    parser.add_argument('-c', '--columns', nargs='+', default=['full'], help='column sets, see synthetic_log.py')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-n', '--repeat', type=int, default=1, help='timed runs per case, the fastest counts')
+    parser.add_argument('-w', '--workdir', default='benchmark-logs', help='directory of the generated logs')
+    parser.add_argument('-o', '--output', help='write the report (.json)')
+    parser.add_argument('--parallel', action='store_true', help='analyze the axes concurrently like CSV_log does on more than one core')
+    parser.add_argument('--no-memory', action='store_true', help='skip the run with memory tracing (tracemalloc)')
+    parser.add_argument('-p', '--precision', choices=['float64', 'float32'], default='float64',
+                        help='precision of the analysis, float32 results are also checked against float64 ones')
+    parser.add_argument('-k', '--chunk-rows', type=int,
+                        help='read and analyze the logs in blocks of rows (bounded memory), see CSV_log.chunk_rows')
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as new baseline')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(levelname)s %(message)s', level=logging.ERROR)
+    os.makedirs(args.workdir, exist_ok=True)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    report = {}
+    failed = False
+    for columns in args.columns:
+        for rate in args.rates:
+            for duration in args.durations:
+                name = case_name(rate, duration, columns, args.seed)
+                path, meta = prepare_log(args.workdir, rate, duration, columns, args.seed)
+
+                runs = [run_case(path, meta['header'], args.parallel, False, args.precision, args.chunk_rows)
+                        for _ in range(args.repeat)]
+                results, wall, stages = min(runs, key=lambda run: run[1])
+                case = {
+                    'wall': wall,
+                    'stages': {stage: {'calls': totals['calls'], 'wall': totals['wall'], 'cpu': totals['cpu']}
+                               for stage, totals in stages.items()},
+                }
+                if not args.no_memory:
+                    _, _, memory_stages = run_case(path, meta['header'], args.parallel, True, args.precision,
+                                                   args.chunk_rows)
+                    for stage, totals in memory_stages.items():
+                        case['stages'].setdefault(stage, {})['peak_bytes'] = totals['peak_bytes']
+                case['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+                case['truth_failures'] = check_truth(results, meta['truth'])
+                if args.precision == 'float64':
+                    prints = {axis: fingerprint(result) for axis, result in results.items()}
+                    if args.update_baseline:
+                        baseline[name] = prints
+                    elif name in baseline:
+                        case['baseline_differences'] = compare_fingerprints(baseline[name], prints)
+                else:
+                    # the baseline is float64, single precision is compared to a float64 run of the same log instead
+                    reference, _, _ = run_case(path, meta['header'], args.parallel, False, chunk_rows=args.chunk_rows)
+                    case['precision_differences'] = compare_results(reference, results)
+                failed |= bool(case['truth_failures'] or case.get('baseline_differences')
+                               or case.get('precision_differences'))
+                report[name] = case
+
+                print('%s: %.2f s' % (name, wall))
+                for stage, totals in case['stages'].items():
+                    print('    %-20s %4d calls %8.3f s wall %8.3f s cpu %10.1f MB peak' % (
+                        stage, totals.get('calls', 0), totals.get('wall', 0.), totals.get('cpu', 0.),
+                        totals.get('peak_bytes', 0) / 1e6))
+                print('    max rss %.1f MB' % (case['max_rss_bytes'] / 1e6))
+                for failure in case['truth_failures']:
+                    print('    TRUTH ' + failure)
+                if 'baseline_differences' in case:
+                    print('    baseline: ' + ('ok' if not case['baseline_differences'] else
+                                              '%d differences' % len(case['baseline_differences'])))
+                    for difference in case['baseline_differences'][:20]:
+                        print('    BASELINE ' + difference)
+                if 'precision_differences' in case:
+                    print('    %s vs float64: ' % args.precision + ('ok' if not case['precision_differences'] else
+                                                                   '%d differences' % len(case['precision_differences'])))
+                    for difference in case['precision_differences'][:20]:
+                        print('    PRECISION ' + difference)
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as baseline_file:
+            json.dump(baseline, baseline_file, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=4)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
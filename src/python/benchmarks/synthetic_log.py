@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+import argparse
+import json
+import math
+import numpy as np
+from scipy.signal import lfilter
+
+### synthetic decoded blackbox logs with a known answer: every axis is a first order lag with dead time driven by
+### random setpoint steps, gyro carries a sine at a known frequency on top of white noise.
+DEAD_TIME = 0.006           # s, delay of the simulated craft
+TIME_CONSTANT = 0.010       # s, first order lag of the simulated craft
+GYRO_NOISE_HZ = (180., 210., 240.)      # frequency of the gyro noise peak per axis
+D_TERM_NOISE_HZ = 260.
+DEBUG_NOISE_HZ = (150., 170., 190., 230.)
+STEPS_PER_SECOND = 4.
+P_GAIN = 45.
+CHUNK_SECONDS = 10.         # logs are generated and written in chunks, long logs never live in memory at once
+
+AXES = ('roll', 'pitch', 'yaw')
+
+COLUMN_SETS = {
+    ### 'full' has everything the analyzer reads, 'minimal' only what it needs (no feedforward, d-term or debug)
+    'full': ['loopIteration', 'time (us)',
+             'axisP[0]', 'axisP[1]', 'axisP[2]', 'axisI[0]', 'axisI[1]', 'axisI[2]',
+             'axisD[0]', 'axisD[1]', 'axisD[2]', 'axisF[0]', 'axisF[1]', 'axisF[2]',
+             'rcCommand[0]', 'rcCommand[1]', 'rcCommand[2]', 'rcCommand[3]',
+             'gyroADC[0]', 'gyroADC[1]', 'gyroADC[2]',
+             'debug[0]', 'debug[1]', 'debug[2]', 'debug[3]',
+             'motor[0]', 'motor[1]', 'motor[2]', 'motor[3]'],
+    'minimal': ['loopIteration', 'time (us)',
+                'axisP[0]', 'axisP[1]', 'axisP[2]',
+                'rcCommand[0]', 'rcCommand[1]', 'rcCommand[2]', 'rcCommand[3]',
+                'gyroADC[0]', 'gyroADC[1]', 'gyroADC[2]'],
+}
+
+
+def half_height_latency():
+    ### time for the step response of the simulated craft to reach half its height
+    return DEAD_TIME + TIME_CONSTANT * math.log(2.)
+
+def synthetic_header(columns='full'):
+    ### header dict like async_get_log_header returns for a betaflight log
+    return {
+        'logNum': '1',
+        'fwType': 'Betaflight',
+        'craftName': 'synthetic-' + columns,
+        'maxThrottle': '2000',
+        'tpa_breakpoint': '1350',
+        'rollPID': '%d,80,30' % P_GAIN,
+        'pitchPID': '%d,84,34' % P_GAIN,
+        'yawPID': '%d,80,0' % P_GAIN,
+    }
+
+def write_synthetic_log(path, loop_rate=2000, duration=60., columns='full', seed=0):
+    ### writes the csv and returns header and truth (the values the analysis is expected to find)
+    rng = np.random.default_rng(seed)
+    names = COLUMN_SETS[columns]
+    dt = 1. / loop_rate
+    dead = int(round(DEAD_TIME * loop_rate))
+    lag = np.exp(-dt / TIME_CONSTANT)
+    smoothing = np.exp(-dt * 2. * np.pi * 30.)       # 30 Hz setpoint smoothing like rc smoothing
+    total = int(loop_rate * duration)
+
+    setpoint_state = [np.zeros(1) for _ in AXES]
+    lag_state = [np.zeros(1) for _ in AXES]
+    held = [0. for _ in AXES]
+    delayed = [np.zeros(dead) for _ in AXES]
+
+    with open(path, 'w') as csv_file:
+        csv_file.write(', '.join(names) + '\n')
+        for start in range(0, total, int(CHUNK_SECONDS * loop_rate)):
+            n = min(int(CHUNK_SECONDS * loop_rate), total - start)
+            index = np.arange(start, start + n)
+            t = index * dt
+            cols = {
+                'loopIteration': index,
+                'time (us)': np.round(t * 1e6) + rng.integers(-3, 4, n),
+                'rcCommand[3]': 1300. + 300. * np.sin(2. * np.pi * t / 7.) + rng.normal(0., 20., n),
+            }
+            for axis in range(len(AXES)):
+                # piecewise constant setpoint, every other step goes back to center
+                steps = rng.random(n) < STEPS_PER_SECOND * dt
+                levels = rng.normal(0., 250., steps.sum() + 1) * (rng.random(steps.sum() + 1) < 0.5)
+                levels[0] = held[axis]
+                raw = levels[np.cumsum(steps)]
+                held[axis] = raw[-1]
+                setpoint, setpoint_state[axis] = lfilter([1. - smoothing], [1., -smoothing], raw,
+                                                         zi=setpoint_state[axis])
+
+                driven = np.concatenate([delayed[axis], setpoint])
+                delayed[axis] = driven[n:]
+                response, lag_state[axis] = lfilter([1. - lag], [1., -lag], driven[:n], zi=lag_state[axis])
+                gyro = response + 6. * np.sin(2. * np.pi * GYRO_NOISE_HZ[axis] * t) + rng.normal(0., 2., n)
+
+                cols['rcCommand[%d]' % axis] = setpoint / 2.
+                cols['gyroADC[%d]' % axis] = gyro
+                # the analyzer reconstructs its input as P-term / (0.032029 * P) + gyro
+                cols['axisP[%d]' % axis] = (setpoint - gyro) * 0.032029 * P_GAIN
+                cols['axisI[%d]' % axis] = rng.normal(0., 5., n)
+                cols['axisD[%d]' % axis] = rng.normal(0., 5., n) + 10. * np.sin(2. * np.pi * D_TERM_NOISE_HZ * t)
+                cols['axisF[%d]' % axis] = np.gradient(setpoint) * 20.
+            for debug in range(4):
+                cols['debug[%d]' % debug] = rng.normal(0., 5., n) + 20. * np.sin(2. * np.pi * DEBUG_NOISE_HZ[debug] * t)
+            for motor in range(4):
+                cols['motor[%d]' % motor] = cols['rcCommand[3]'] + rng.normal(0., 30., n)
+
+            block = np.column_stack([np.round(cols[name]) for name in names]).astype(np.int64)
+            np.savetxt(csv_file, block, fmt='%d', delimiter=', ')
+
+    return {
+        'header': synthetic_header(columns),
+        'truth': {
+            'latency_half_height': half_height_latency(),
+            'gyro_noise_hz': dict(zip(AXES, GYRO_NOISE_HZ)),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Writes a synthetic decoded blackbox log (.csv) with known answers.')
+    parser.add_argument('csv', help='output csv')
+    parser.add_argument('-r', '--rate', type=int, default=2000, help='loop rate in Hz')
+    parser.add_argument('-d', '--duration', type=float, default=60., help='duration in s')
+    parser.add_argument('-c', '--columns', choices=sorted(COLUMN_SETS), default='full', help='column set')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('--header', help='also write the header (.json) for analyze-one-flight.py')
+    args = parser.parse_args()
+
+    log = write_synthetic_log(args.csv, args.rate, args.duration, args.columns, args.seed)
+    if args.header:
+        with open(args.header, 'w', encoding='utf-8') as header_file:
+            json.dump(log['header'], header_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
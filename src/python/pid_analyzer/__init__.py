@@ -0,0 +1,10 @@
+from .analyzer import (Trace, TraceSweep, CSV_log, async_analyze_flight, async_analyze_flights, async_sweep_flight,
+                       to_json, to_binary, write_results)
+from .cache import ResultCache, DirectoryStore, MemoryStore
+from .profiling import set_profiling
+from .splitter import async_split_bbl_buffer, async_split_bbl_file
+
+__all__ = ['Trace', 'TraceSweep', 'CSV_log', 'async_analyze_flight', 'async_analyze_flights', 'async_sweep_flight',
+           'to_json', 'to_binary', 'write_results',
+           'ResultCache', 'DirectoryStore', 'MemoryStore',
+           'set_profiling', 'async_split_bbl_buffer', 'async_split_bbl_file']
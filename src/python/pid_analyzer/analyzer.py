@@ -0,0 +1,1620 @@
+import asyncio
+import functools
+import io
+import logging
+import json
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .buffers import BufferReader
+from .cache import ResultCache, open_cache
+from .csvreader import read_columns, read_header
+from .numeric import async_load_single_precision_fft, gaussian_filter1d, single_precision_fft
+from .profiling import profiled, profiler, set_profiling
+from .status import record_status, reportStatusToJs
+
+ANALYZER_VERSION = '2'      # bump whenever results change for the same log, invalidates cached results (see ResultCache)
+# 2: result layout of max_points decimation and outputs, smoothing and csv reading on numpy alone
+
+class Trace:
+    framelen = 1.           # length of each single frame over which to compute response
+    resplen = 0.5           # length of respose window
+    cutfreq = 25.           # cutfreqency of what is considered as input
+    tuk_alpha = 1.0         # alpha of tukey window, if used
+    superpos = 16           # sub windowing (superpos windows in framelen)
+    low_threshold = 50      # treshold for 'looooow input rate'
+    threshold = 500.        # threshold for 'high input rate'
+    toolow_threshold = 20.  # windows with less input are too noisy for a step response
+    noise_framelen = 0.3    # window width for noise analysis
+    noise_superpos = 16     # subsampling for noise analysis windows
+
+    wiener_masks = 16       # regularization masks of wiener_deconvolution kept in memory, see wiener_mask
+
+    PARAMETERS = ('framelen', 'resplen', 'cutfreq', 'tuk_alpha', 'superpos', 'low_threshold', 'threshold',
+                  'toolow_threshold', 'noise_framelen', 'noise_superpos')
+
+    @classmethod
+    def parameters(cls):
+        ### the analysis parameters above, part of the key of cached results
+        return {name: getattr(cls, name) for name in cls.PARAMETERS}
+
+    # stages of the analysis and the stages they need. every stage is computed by its method async_<stage>,
+    # only when an output needs it and only once per trace (see async_compute). thr_response (with resp_quality),
+    # filter_trans and throt_hist are not exported, they are only computed when asked for with async_compute
+    STAGES = {
+        'input': (),
+        'throt_hist': (),
+        'response_stack': ('input',),           # windows, their deconvolved responses and the input masks
+        'resp_binning': ('response_stack',),
+        'resp_sm': ('resp_binning',),
+        'thr_response': ('resp_sm',),
+        'resp_low': ('resp_binning',),
+        'resp_high': ('resp_binning',),
+        'resp_throttle': ('resp_binning',),
+        'delay': ('resp_low',),
+        'noise': (),                            # spectrograms of gyro, d-term and debug
+        'filter_trans': ('noise',),
+    }
+
+    # exported results (see to_result_object) and the stages they need
+    OUTPUTS = {
+        'gyro': (),
+        'input': ('input',),
+        'time': (),
+        'throttle': (),
+        'feedforward': (),
+        'time_resp': (),
+        'resp_low': ('resp_low',),
+        'high_mask': ('response_stack',),
+        'noise_gyro': ('noise',),
+        'noise_d': ('noise',),
+        'noise_debug': ('noise',),
+        'delay': ('delay',),
+        'resp_high': ('resp_high',),
+        'resp_throttle': ('resp_throttle',),
+    }
+
+    # outputs by section of the plots, in the order async_init completes them (see CSV_log.async_stream_section)
+    SECTIONS = {
+        'series': ('gyro', 'input', 'time', 'throttle', 'feedforward'),
+        'response': ('time_resp', 'resp_low', 'high_mask', 'delay', 'resp_high', 'resp_throttle'),
+        'noise': ('noise_gyro', 'noise_d', 'noise_debug'),
+    }
+
+    @classmethod
+    def stages(cls, outputs=None):
+        ### all stages outputs (None for all of OUTPUTS) need, in an order that computes every stage after the
+        ### ones it needs
+        stages = []
+        def add(stage):
+            if stage not in stages:
+                for needed in cls.STAGES[stage]:
+                    add(needed)
+                stages.append(stage)
+        for output in cls.resolve_outputs(outputs):
+            for stage in cls.OUTPUTS[output]:
+                add(stage)
+        return stages
+
+    @classmethod
+    def resolve_outputs(cls, outputs=None):
+        ### checked outputs in the order of OUTPUTS, None for all
+        if outputs is None:
+            return tuple(cls.OUTPUTS)
+        unknown = set(outputs) - set(cls.OUTPUTS)
+        if unknown:
+            raise ValueError('unknown outputs: ' + ', '.join(sorted(unknown)))
+        return tuple(output for output in cls.OUTPUTS if output in outputs)
+
+    @classmethod
+    def resolve_throttle_bands(cls, throttle_bands=None):
+        ### checked band edges in % of resp_throttle as floats: at least 2, strictly increasing, within 0 and 100.
+        ### None skips resp_throttle
+        if throttle_bands is None:
+            return None
+        bands = [float(edge) for edge in throttle_bands]
+        if (len(bands) < 2 or not all(0. <= edge <= 100. for edge in bands)
+                or any(lower >= upper for lower, upper in zip(bands, bands[1:]))):
+            raise ValueError('throttle_bands must be at least 2 increasing edges within 0 and 100, not '
+                             + str(list(throttle_bands)))
+        return bands
+
+    def to_json_object(self):
+        return to_json(self.to_result_object())
+
+    def to_result_object(self, max_points=None, outputs=None):
+        ### exported results (self.outputs, only the ones of them in outputs if given, e.g. a section), arrays
+        ### are kept as ndarrays (see to_json / to_binary).
+        ### with max_points the full-rate time series are decimated to display resolution, see minmax_decimate
+        outputs = self.outputs if outputs is None else [output for output in self.outputs if output in outputs]
+        names = [name for name in ('gyro', 'input', 'throttle', 'feedforward') if name in outputs]
+        series = [self.time] + [self.data['feedforward'] if name == 'feedforward' else getattr(self, name)
+                                for name in names]
+        if max_points is not None:
+            series = self.minmax_decimate(series[0], np.stack(series[1:]) if names else np.empty((0, len(series[0]))),
+                                          max_points)
+        series = dict(zip(['time'] + names, series))
+
+        output = {name: series[name] for name in ('gyro', 'input', 'time', 'throttle', 'feedforward')
+                  if name in outputs}
+        if 'time_resp' in outputs:
+            output['time_resp'] = self.time_resp
+        if 'resp_low' in outputs:
+            output['resp_low'] = self.resp_low[0]
+        if 'high_mask' in outputs:
+            output['high_mask'] = self.high_mask
+        for name in ('noise_gyro', 'noise_d', 'noise_debug'):
+            if name in outputs:
+                output[name] = {
+                    'freq_axis': getattr(self, name)['freq_axis'],
+                    'hist2d_sm': getattr(self, name)['hist2d_sm'],
+                }
+        if 'delay' in outputs:
+            output['delay'] = {
+                'latency_half_height': self.delay['latency_half_height'],
+                'half_height_index': int(self.delay['half_height_index']),
+                'peak_response': self.delay['peak_response'],
+                'peak_time': self.delay['peak_time'],
+            }
+
+        if 'resp_high' in outputs and self.high_mask.sum()>0:
+            output['resp_high'] = self.resp_high[0]
+
+        if 'resp_throttle' in outputs and self.throttle_bands is not None:
+            output['resp_throttle'] = {
+                'bands': np.asarray(self.throttle_bands, dtype=np.float64),
+                'resp': self.resp_throttle[0],
+                'windows': self.resp_throttle_windows.astype(np.float64),
+            }
+
+        return output
+
+    def __init__(self, data, throttle_bands=None, dtype=None, outputs=None):
+        self.data = data
+        self.name = data.get('name')            # roll, pitch or yaw
+        self.throttle_bands = self.resolve_throttle_bands(throttle_bands)  # band edges in % for resp_throttle
+        self.outputs = self.resolve_outputs(outputs)  # exported results, only the stages they need are computed
+        self.computed = set()                   # stages computed so far, see async_compute
+        # the traces come in the precision of CSV_log (float64 or float32), the analysis keeps it. time stays float64
+        self.dtype = np.asarray(data['gyro']).dtype if dtype is None else np.dtype(dtype)
+        # scipy.fft keeps single precision with numpy < 2 (pyodide ships numpy 1.26), see single_precision_fft
+        self.fft = single_precision_fft() if self.dtype == np.float32 else np.fft
+
+    async def async_init(self, on_section=None):
+        ### runs the analysis section by section (see SECTIONS), the coroutine on_section(trace, section)
+        ### is awaited as soon as the outputs of a section are computed.
+        # data comes equalized to a uniform time scale from CSV_log.async_equalize
+        self.time = self.data['time']
+        self.dt=self.time[0]-self.time[1]
+
+        self.gyro = self.data['gyro']
+        self.throttle = self.data['throttle']
+
+        self.flen = self.stepcalc(self.time, Trace.framelen)        # array len corresponding to framelen in s
+        self.rlen = self.stepcalc(self.time, Trace.resplen)         # array len corresponding to resplen in s
+        self.time_resp = self.time[0:self.rlen]-self.time[0]
+
+        for section, outputs in self.SECTIONS.items():
+            for stage in self.stages([output for output in outputs if output in self.outputs]):
+                await self.async_compute(stage)
+            if on_section is not None:
+                await on_section(self, section)
+
+    async def async_compute(self, stage):
+        ### computes stage and the stages it needs, unless they are computed already
+        if stage in self.computed:
+            return
+        for needed in self.STAGES[stage]:
+            await self.async_compute(needed)
+        await getattr(self, 'async_' + stage)()
+        self.computed.add(stage)
+
+    async def async_input(self):
+        self.data.update({'input': self.pid_in(self.data['p_err'], self.data['gyro'], self.data['P'])})
+        self.input = self.data['input']
+
+    async def async_throt_hist(self):
+        self.throt_hist, self.throt_scale = np.histogram(self.throttle, np.linspace(0, 100, 101, dtype=np.float64), density=True)
+
+    async def async_response_stack(self):
+        self.stacks = self.winstacker({'time':[],'input':[],'gyro':[], 'throttle':[]}, self.flen, Trace.superpos)                                  # [[time, input, output],]
+        self.window = np.hanning(self.flen).astype(self.dtype)                  #self.tukeywin(self.flen, self.tuk_alpha)
+        self.spec_sm, self.avr_t, self.avr_in, self.max_in, self.max_thr = self.stack_response(self.stacks, self.window)
+        self.low_mask, self.high_mask = self.low_high_mask(self.max_in, self.threshold)       #calcs masks for high and low inputs according to threshold
+        self.toolow_mask = self.low_high_mask(self.max_in, self.toolow_threshold)[1]          #mask for ignoring noisy low input
+
+    async def async_resp_binning(self):
+        self.resp_binning = self.response_binning(self.spec_sm, [-1.5,3.5], 1000)
+
+    async def async_resp_sm(self):
+        self.resp_sm = await self.async_binned_mode_avr(self.resp_binning, self.toolow_mask)
+
+    async def async_thr_response(self):
+        # in float64, the clip range is below float32 resolution
+        self.resp_quality = -self.to_mask((np.abs(self.spec_sm -self.resp_sm[0]).mean(axis=1, dtype=np.float64)).clip(0.5-1e-9,0.5))+1.
+        # masking by setting trottle of unwanted traces to neg
+        self.thr_response = self.hist2d(self.max_thr * (2. * (self.toolow_mask*self.resp_quality) - 1.), self.time_resp,
+                                        (self.spec_sm.transpose() * self.toolow_mask).transpose(), [101, self.rlen])
+
+    async def async_resp_low(self):
+        self.resp_low = await self.async_binned_mode_avr(self.resp_binning, self.low_mask*self.toolow_mask)
+
+    async def async_resp_high(self):
+        if self.high_mask.sum()>0:
+            self.resp_high = await self.async_binned_mode_avr(self.resp_binning, self.high_mask*self.toolow_mask)
+
+    async def async_resp_throttle(self):
+        if self.throttle_bands is not None:
+            band_weights = self.throttle_band_weights(np.asarray(self.throttle_bands, dtype=np.float64),
+                                                      self.max_thr, self.toolow_mask)
+            self.resp_throttle = await self.async_binned_mode_avr(self.resp_binning, band_weights)
+            self.resp_throttle_windows = band_weights.astype(bool).sum(axis=1)
+
+    async def async_delay(self):
+        self.delay = self.response_delay()
+
+    async def async_noise(self):
+        self.noise_winlen = self.stepcalc(self.time, Trace.noise_framelen)
+        self.noise_stack = self.winstacker({'time':[], 'gyro':[], 'throttle':[], 'd_err':[], 'debug':[]},
+                                           self.noise_winlen, Trace.noise_superpos)
+        self.noise_win = np.hanning(self.noise_winlen).astype(self.dtype)
+
+        self.noise_gyro, self.noise_d, self.noise_debug = self.stackspectra(self.noise_stack['time'], self.noise_stack['throttle'],
+                                                                            [self.noise_stack['gyro'], self.noise_stack['d_err'], self.noise_stack['debug']],
+                                                                            self.noise_win)
+
+    async def async_filter_trans(self):
+        if self.noise_debug['hist2d'].sum()>0:
+            ## mask 0 entries
+            thr_mask = self.noise_gyro['throt_hist_avr'].clip(0,1)
+            self.filter_trans = np.average(self.noise_gyro['hist2d'], axis=1, weights=thr_mask)/\
+                                np.average(self.noise_debug['hist2d'], axis=1, weights=thr_mask)
+        else:
+            self.filter_trans = self.noise_gyro['hist2d'].mean(axis=1)*0.
+
+    def response_delay(self):
+        ### delay of resp_low, -1 for everything if it has none (e.g. no low input windows)
+        try:
+            return self.calculate_delay(self.time_resp, self.resp_low[0])
+        except Exception as e:
+            logging.error('Error: ' + str(e))
+            return {
+                'latency_half_height': -1,
+                'half_height_index': -1,
+                'peak_response': -1,
+                'peak_time': -1
+            }
+
+    @staticmethod
+    def low_high_mask(signal, threshold):
+        low = np.copy(signal)
+
+        low[low <=threshold] = 1.
+        low[low > threshold] = 0.
+        high = -low+1.
+
+        if high.sum() < 10:     # ignore high pinput that is too short
+            high *= 0.
+
+        return low, high
+
+    @staticmethod
+    def to_mask(clipped):
+        clipped-=clipped.min()
+        clipped/=clipped.max()
+        return clipped
+
+    def pid_in(self, pval, gyro, pidp):
+        pidin = gyro + pval / (0.032029 * pidp)       # 0.032029 is P scaling factor from betaflight
+        return pidin
+
+    def rate_curve(self, rcin, inmax=500., outmax=800., rate=160.):
+        ### an estimated rate curve. not used.
+        expoin = (np.exp((rcin - inmax) / rate) - np.exp((-rcin - inmax) / rate)) * outmax
+        return expoin
+
+    def tukeywin(self, len, alpha=0.5):
+        ### makes tukey widow for envelopig
+        M = len
+        n = np.arange(M - 1.)  #
+        if alpha <= 0:
+            return np.ones(M)  # rectangular window
+        elif alpha >= 1:
+            return np.hanning(M)
+
+        # Normal case
+        x = np.linspace(0, 1, M, dtype=np.float64)
+        w = np.ones(x.shape)
+
+        # first condition 0 <= x < alpha/2
+        first_condition = x < alpha / 2
+        w[first_condition] = 0.5 * (1 + np.cos(2 * np.pi / alpha * (x[first_condition] - alpha / 2)))
+
+        # second condition already taken care of
+
+        # third condition 1 - alpha / 2 <= x <= 1
+        third_condition = x >= (1 - alpha / 2)
+        w[third_condition] = 0.5 * (1 + np.cos(2 * np.pi / alpha * (x[third_condition] - 1 + alpha / 2)))
+
+        return w
+
+    def stepcalc(self, time, duration):
+        ### calculates frequency and resulting windowlength
+        tstep = (time[1]-time[0])
+        freq = 1./tstep
+        arr_len = duration * freq
+        return int(arr_len)
+
+    def winstacker_original(self, stackdict, flen, superpos):
+        ### makes stack of windows for deconvolution
+        tlen = len(self.data['time'])
+        shift = int(flen/superpos)
+        wins = int(tlen/shift)-superpos
+        for i in np.arange(wins):
+            for key in stackdict.keys():
+                stackdict[key].append(self.data[key][i * shift:i * shift + flen])
+        for k in stackdict.keys():
+            stackdict[k]=np.array(stackdict[k], dtype=np.float64)
+        return stackdict
+    
+    @profiled('winstacker')
+    def winstacker(self, stackdict, flen, superpos):
+        ### makes stack of windows for deconvolution
+        ### windows are read-only strided views into self.data, nothing is copied here.
+        ### same windows as winstacker_original, minus the ones running past the end of the data.
+        tlen = len(self.data['time'])
+        shift = int(flen/superpos)
+        wins = int(tlen/shift)-superpos
+        for key in stackdict.keys():
+            trace = np.asarray(self.data[key], dtype=np.float64 if key == 'time' else self.dtype)
+            stackdict[key] = sliding_window_view(trace, flen)[:max(wins, 0) * shift:shift]
+        return stackdict
+
+    @profiled('deconvolution')
+    def wiener_deconvolution(self, input, output, cutfreq):      # input/output are two-dimensional
+        H, G, length = self.window_spectra(input, output)
+        sn = self.wiener_mask(length, cutfreq)
+        denom = H.real**2 + H.imag**2
+        denom += 1./sn
+        G *= np.conj(H, out=H)
+        G /= denom
+        deconvolved_sm = self.fft.irfft(G, n=length, axis=-1)
+        return deconvolved_sm
+
+    def window_spectra(self, input, output):
+        ### spectra H and G of the input and output windows for wiener_deconvolution, and their padded length
+        # zero padding to the next multiple of 1024 as in the original analysis, the responses depend on it
+        length = len(input[0]) + 1024 - (len(input[0]) % 1024)
+        H = self.fft.rfft(input, n=length, axis=-1)             # input/output are real, rfft zero-pads to length
+        G = self.fft.rfft(output, n=length, axis=-1)
+        return H, G, length
+
+    def wiener_mask(self, length, cutfreq):
+        ### regularization mask (sn) of wiener_deconvolution for the rfft bins of a given length.
+        ### only depends on (length, dt, cutfreq) and the precision, the last wiener_masks of them are cached.
+        return self.cached_wiener_mask(length, float(self.dt), float(cutfreq), self.dtype.name)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=wiener_masks)
+    def cached_wiener_mask(length, dt, cutfreq, dtype):
+        freq = np.abs(np.fft.fftfreq(length, dt))               # smoothing runs over the full spectrum, as before
+        sn = Trace.to_mask(np.clip(np.abs(freq), cutfreq-1e-9, cutfreq))
+        len_lpf=np.sum(np.ones_like(sn)-sn)
+        sn=Trace.to_mask(gaussian_filter1d(sn,len_lpf/6.))
+        sn= 10.*(-sn+1.+1e-9)       # +1e-9 to prohibit 0/0 situations
+        sn = sn[:length//2+1].astype(dtype)
+        sn.flags.writeable = False
+        return sn
+
+    def stack_response(self, stacks, window):
+        inp = stacks['input'] * window
+        outp = stacks['gyro'] * window
+        thr = stacks['throttle'] * window
+
+        deconvolved_sm = self.wiener_deconvolution(inp, outp, self.cutfreq)[:, :self.rlen]
+        delta_resp = deconvolved_sm.cumsum(axis=1)
+
+        max_thr = np.abs(np.abs(thr)).max(axis=1)
+        avr_in = np.abs(np.abs(inp)).mean(axis=1)
+        max_in = np.max(np.abs(inp), axis=1)
+        avr_t = stacks['time'].mean(axis=1)
+
+        return delta_resp, avr_t, avr_in, max_in, max_thr
+
+    @staticmethod
+    def minmax_decimate(time, traces, points):
+        ### reduces traces (one row per channel on the common time axis) to at most points samples. each bucket
+        ### of consecutive samples keeps its min and max in order of occurrence, placed at the times of the first
+        ### and last sample of the bucket, so peaks stay visible at display resolution.
+        length = len(time)
+        buckets = int(points) // 2
+        if length <= points or buckets < 1:
+            return [time, *traces]
+        return Trace.minmax_buckets(time, traces, np.linspace(0, length, buckets + 1).astype(int))
+
+    @staticmethod
+    def minmax_buckets(time, traces, edges):
+        ### min and max of every bucket of samples edges[i]:edges[i+1] in order of occurrence, see minmax_decimate.
+        ### edges start at 0 and end at the length of time.
+        length = len(time)
+        buckets = len(edges) - 1
+        starts = edges[:-1]
+        index = np.arange(length)
+        bucket = np.repeat(np.arange(buckets), np.diff(edges))
+
+        mins = np.minimum.reduceat(traces, starts, axis=1)
+        maxs = np.maximum.reduceat(traces, starts, axis=1)
+        first_min = np.minimum.reduceat(np.where(traces == mins[:, bucket], index, length), starts, axis=1)
+        first_max = np.minimum.reduceat(np.where(traces == maxs[:, bucket], index, length), starts, axis=1)
+        min_first = first_min <= first_max
+
+        decimated = np.empty((len(traces), buckets, 2), dtype=traces.dtype)
+        decimated[:, :, 0] = np.where(min_first, mins, maxs)
+        decimated[:, :, 1] = np.where(min_first, maxs, mins)
+        decimated_time = np.stack([time[starts], time[edges[1:] - 1]], axis=1)
+        return [decimated_time.reshape(-1), *decimated.reshape(len(traces), 2 * buckets)]
+
+    def spectrum(self, time, traces):
+        ### fouriertransform for noise analysis. returns frequencies and spectrum.
+        ### traces may be a stack of any dimension, the transform runs along the last axis.
+        length = np.shape(traces)[-1]
+        length += 1024 - (length % 1024)  # zero padding to the next multiple of 1024, sets the frequency resolution
+        trspec = self.fft.rfft(traces, n=length, axis=-1, norm='ortho')
+        trfreq = np.fft.rfftfreq(length, time[1] - time[0])
+        return trfreq, trspec
+
+    def stackfilter(self, time, trace_ref, trace_filt, window):
+        ### calculates filter transmission and phaseshift from stack of windows. Not in use, maybe later.
+        # slicing off last 2s to get rid of landing
+        # maybe pass throttle for further analysis...
+        filt = trace_filt[:-int(Trace.noise_superpos * 2. / Trace.noise_framelen), :] * window
+        ref = trace_ref[:-int(Trace.noise_superpos * 2. / Trace.noise_framelen), :] * window
+        time = time[:-int(Trace.noise_superpos * 2. / Trace.noise_framelen), :]
+
+        full_freq_f, full_spec_f = self.spectrum(self.data['time'], [self.data['gyro']])
+        full_freq_r, full_spec_r = self.spectrum(self.data['time'], [self.data['debug']])
+
+        f_amp_freq, f_amp_hist = np.histogram(full_freq_f, weights=np.abs(full_spec_f.real).flatten(), bins=int(full_freq_f[-1]))
+        r_amp_freq, r_amp_hist = np.histogram(full_freq_r, weights=np.abs(full_spec_r.real).flatten(), bins=int(full_freq_r[-1]))
+
+    def hist2d(self, x, y, weights, bins):   #bins[nx,ny]
+        ### generates a 2d hist from input 1d axis for x,y. weights has shape X*Y (data points).
+        ### x will be 0-100%
+        ### weights may have leading dimensions (stack of traces), all of them are binned on the same x,y.
+        ### x only varies by row and y only by column, so both are binned separately (same bins as np.histogram2d)
+        ### and weights are summed column- and then row-wise, without repeating x,y to the shape of weights.
+        throt_hist_avr, throt_scale_avr = np.histogram(x, 101, [0, 100])
+
+        x_index = self.bin_index(x, bins[0], [0, 100])
+        y_index = self.bin_index(y, bins[1], [y[0], y[-1]])
+        planes = np.reshape(weights, (-1, len(x), len(y)))
+        hist2d = self.bin_sum(self.bin_sum(planes, y_index, bins[1], axis=2), x_index, bins[0], axis=1)
+        hist2d = np.swapaxes(hist2d, -1, -2).reshape(np.shape(weights)[:-2] + (bins[1], bins[0]))
+        hist2d = np.abs(hist2d)
+        hist2d_norm = np.copy(hist2d)
+        hist2d_norm /=  (throt_hist_avr + 1e-9)
+
+        return {
+            'hist2d_norm': hist2d_norm,
+            'hist2d': hist2d,
+            'throt_hist': throt_hist_avr,
+            'throt_scale': throt_scale_avr
+        }
+
+    @staticmethod
+    def bin_index(values, bins, value_range):
+        ### index of the equally spaced bin each value falls into, -1 if outside of value_range.
+        ### same binning as np.histogram2d: right edge of the last bin is inclusive.
+        ### single precision values are compared to single precision edges, everything else in float64.
+        values = np.asarray(values)
+        values = values.astype(np.float64 if values.dtype != np.float32 else np.float32, copy=False)
+        edges = np.linspace(value_range[0], value_range[-1], bins + 1).astype(values.dtype)
+        index = np.searchsorted(edges, values, side='right') - 1
+        index[values == edges[-1]] = bins - 1
+        index[(index < 0) | (index >= bins)] = -1
+        return index
+
+    @staticmethod
+    def bin_sum(values, index, bins, axis):
+        ### sums values along axis into bins, index gives the bin of each position along axis (see bin_index).
+        order = np.argsort(index, kind='stable')
+        order = order[index[order] >= 0]
+        shape = list(np.shape(values))
+        shape[axis] = bins
+        summed = np.zeros(shape, dtype=np.result_type(values, np.float32))
+        if len(order) == 0:
+            return summed
+        if len(order) != np.shape(values)[axis] or np.any(order[1:] < order[:-1]):
+            values = np.take(values, order, axis=axis)          # only copies if bins are not contiguous already
+        sorted_index = index[order]
+        starts = np.flatnonzero(np.r_[True, sorted_index[1:] != sorted_index[:-1]])
+        target = [slice(None)] * len(shape)
+        target[axis] = sorted_index[starts]
+        summed[tuple(target)] = np.add.reduceat(values, starts, axis=axis)
+        return summed
+
+    def stackspectrum(self, time, throttle, trace, window):
+        ### calculates spectrogram from stack of windows against throttle.
+        return self.stackspectra(time, throttle, [trace], window)[0]
+
+    @profiled('stackspectrum')
+    def stackspectra(self, time, throttle, traces, window):
+        ### calculates spectrograms of several traces from the same stack of windows against throttle.
+        ### all traces go through one rfft, throttle and histogram binning are shared between them.
+        # slicing off last 2s to get rid of landing
+        cut = int(Trace.noise_superpos*2./Trace.noise_framelen)
+        freq, hist2d = self.spectra_hist(time[:-cut,:], throttle[:-cut,:], [trace[:-cut,:] for trace in traces], window)
+        return self.spectra_from_hist(freq, hist2d)
+
+    def spectra_hist(self, time, throttle, traces, window):
+        ### throttle/frequency histograms (see hist2d) of the spectra of several traces from the same stack of windows.
+        ### hist2d and throt_hist are sums over the windows, so the ones of consecutive stacks add up.
+        stack = np.stack(traces) * window
+        thr = throttle * window
+
+        freq, spec = self.spectrum(time[0], stack)
+        del stack
+
+        weights = np.abs(spec.real)
+        del spec
+        avr_thr = np.abs(thr).max(axis=1)
+
+        return freq, self.hist2d(avr_thr, freq,weights,[101,int(len(freq)/4)])
+
+    def spectra_from_hist(self, freq, hist2d):
+        ### smoothed spectrograms and their maxima from the histograms of spectra_hist
+        filt_width = 3  # width of gaussian smoothing for hist data
+        hist2d_sm = gaussian_filter1d(hist2d['hist2d_norm'], filt_width, axis=-1, mode='constant')
+
+        # get max value in histogram >100hz
+        thresh = 100.
+        mask = self.to_mask(freq[:-1:4].clip(thresh-1e-9,thresh))
+        maxvals = np.max(hist2d_sm * mask[:, np.newaxis], axis=(1, 2))
+
+        return [{
+            'throt_hist_avr': hist2d['throt_hist'],
+            'throt_axis': hist2d['throt_scale'],
+            'freq_axis': freq[::4],
+            'hist2d_norm': hist2d['hist2d_norm'][i],
+            'hist2d_sm': hist2d_sm[i],
+            'hist2d': hist2d['hist2d'][i],
+            'max':maxvals[i]
+        } for i in range(len(hist2d_sm))]
+
+    async def async_weighted_mode_avr(self, values, weights, vertrange, vertbins):
+        ### finds the most common trace and std
+        return await self.async_binned_mode_avr(self.response_binning(values, vertrange, vertbins), weights)
+
+    @profiled('weighted_mode_avr')
+    def response_binning(self, values, vertrange, vertbins):
+        ### digitizes a stack of responses (windows x time_resp) into the vertbins x time_resp grid of
+        ### async_binned_mode_avr. done once per stack, every weighting of the windows reuses it.
+        rlen = len(self.time_resp)
+        t_index = self.bin_index(self.time_resp, rlen, [self.time_resp[0], self.time_resp[-1]])
+        v_index = self.bin_index(values, vertbins, vertrange)
+        index = v_index * rlen + t_index
+        index[(v_index < 0) | (t_index < 0)] = vertbins * rlen      # overflow bin, dropped after counting
+
+        return {
+            'index': index.astype(np.int32),
+            'vertrange': vertrange,
+            'vertbins': vertbins,
+        }
+
+    async def async_binned_mode_avr(self, binning, weights):
+        ### finds the most common trace and std of the binned stack, windows weighted by weights (e.g. a mask).
+        ### weights of shape (n, windows) give n weightings of the same stack (e.g. throttle bands) in one pass,
+        ### with results stacked along the first axis.
+        avr, std, (time_resp, resp_y, hist2d_sm) = await self.async_hist_mode_avr(
+            self.binned_hist(binning, np.atleast_2d(weights)), binning['vertrange'], binning['vertbins'])
+
+        if np.ndim(weights) != 2:
+            return avr[0], std[0], [time_resp, resp_y, hist2d_sm[0]]
+        return avr, std, [time_resp, resp_y, hist2d_sm]
+
+    @profiled('weighted_mode_avr')
+    def binned_hist(self, binning, weights):
+        ### weighted histograms (vertbins x time_resp) of the binned stack, one per row of weights (n, windows).
+        ### sums over the windows, so the histograms of consecutive stacks add up.
+        vertbins = binning['vertbins']
+        rlen = len(self.time_resp)
+
+        # windows with weight 0 do not contribute, so only the selected ones are counted.
+        # every weighting gets its own range of bins (incl. overflow bin), so all are counted by one bincount
+        size = vertbins * rlen + 1
+        sets, rows = np.nonzero(weights)
+        index = binning['index'][rows] + (sets * size)[:, np.newaxis]
+        hist2d = np.bincount(index.ravel(), weights=np.repeat(weights[sets, rows], rlen),
+                             minlength=len(weights) * size).reshape(len(weights), size)[:, :-1].reshape(-1, vertbins, rlen)
+        return hist2d.astype(self.dtype, copy=False)
+
+    @profiled('weighted_mode_avr')
+    async def async_hist_mode_avr(self, hist2d, vertrange, vertbins):
+        ### most common trace and std of every histogram of binned_hist (changes hist2d).
+        ### results are stacked along the first axis, see async_binned_mode_avr
+        threshold = 0.5  # threshold for std calculation
+        filt_width = 7  # width of gaussian smoothing for hist data
+
+        rlen = len(self.time_resp)
+        resp_y = np.linspace(vertrange[0], vertrange[-1], vertbins, dtype=self.dtype)
+        ### shift outer edges by +-1e-5 (10us) bacause of dtype32. Otherwise different precisions lead to artefacting.
+        ### solution to this --> somethings strage here. In outer most edges some bins are doubled, some are empty.
+        ### Hence sometimes produces "divide by 0 error" in "/=" operation.
+
+        filled = hist2d.sum(axis=(1, 2)) > 0
+        hist2d_sm = hist2d.copy()
+        avr = np.zeros((len(hist2d), rlen), dtype=self.dtype)
+        if filled.any():
+            hist2d_sm[filled] = gaussian_filter1d(hist2d[filled], filt_width, axis=1, mode='constant')
+            hist2d_sm[filled] /= np.max(hist2d_sm[filled], 1)[:, np.newaxis]
+
+
+            if (resp_y.size == 0):
+                await reportStatusToJs("ERROR", "resp_y.size == 0")
+                sys.exit(1)
+                return
+            pixelweights = hist2d_sm[filled] * hist2d_sm[filled]
+            avr[filled] = resp_y @ pixelweights / pixelweights.sum(axis=1)
+        # only used for monochrome error width
+        hist2d[hist2d <= threshold] = 0.
+        hist2d[hist2d > threshold] = 0.5 / (vertbins / (vertrange[-1] - vertrange[0]))
+
+        std = np.sum(hist2d, 1)
+
+        return avr, std, [self.time_resp, resp_y, hist2d_sm]
+
+    @staticmethod
+    def throttle_band_weights(bands, max_thr, toolow_mask):
+        ### one row per throttle band (edges in %, e.g. [0, 25, 50, 75, 100]) selecting the windows whose
+        ### max_thr falls into the band, noisy low input windows (toolow_mask) are left out like for resp_sm
+        band = np.digitize(max_thr, bands) - 1
+        band[max_thr == bands[-1]] = len(bands) - 2        # last band includes its upper edge
+        return (band == np.arange(len(bands) - 1)[:, np.newaxis]) * toolow_mask
+
+    ### calculates weighted avverage and resulting errors
+    def weighted_avg_and_std(self, values, weights):
+        average = np.average(values, axis=0, weights=weights)
+        variance = np.average((values - average) ** 2, axis=0, weights=weights)
+        return (average, np.sqrt(variance))
+    
+    def calculate_delay(self, time_resp, resp_low):
+        # Calculate the maximum response and its index
+        logging.info('one')
+        # Jetzt können Sie np.max sicher anwenden
+        max_response = np.max(resp_low)
+        logging.info('two')
+        max_index = np.argmax(resp_low)
+
+        logging.info('three')
+        # Calculate the half height
+        half_height = max_response / 2
+
+        logging.info('four')
+        # Find the first index where response is greater than half height
+        half_height_index = np.where(resp_low > half_height)[0][0]
+
+        logging.info('five')
+        # Calculate the latency at half height
+        latency_half_height = time_resp[half_height_index]
+
+        logging.info('six')
+        # Calculate the peak response and peak time
+        peak_response = max_response
+        peak_time = time_resp[max_index]
+
+        return {'latency_half_height': latency_half_height, 'half_height_index': half_height_index, 'peak_response': peak_response, 'peak_time': peak_time}
+
+class WindowStream:
+    ### cuts the windows of Trace.winstacker (wins windows of flen rows, every shift rows) out of traces that
+    ### arrive in blocks of rows. only the rows from the start of the next window on are kept, so every
+    ### block overlaps the last one by less than one window.
+    def __init__(self, flen, shift, wins):
+        self.flen = flen
+        self.shift = shift
+        self.wins = max(wins, 0)
+        self.next_window = 0
+        self.offset = 0         # row of the first kept row
+        self.rows = None
+
+    def push(self, block):
+        ### block has the next rows of every trace ({key: 1-D array}). returns the stacks (windows x flen per key)
+        ### of the windows completed by block, views into the rows kept until the next push
+        rows = block if self.rows is None else {key: np.concatenate([self.rows[key], block[key]]) for key in block}
+        end = self.offset + len(next(iter(rows.values())))
+        done = min(self.wins, max((end - self.flen) // self.shift + 1, 0))
+        first = self.next_window * self.shift - self.offset
+
+        stacks = {key: sliding_window_view(trace[first:], self.flen)[:(done - self.next_window) * self.shift:self.shift]
+                  if done > self.next_window else np.empty((0, self.flen), dtype=trace.dtype)
+                  for key, trace in rows.items()}
+
+        keep = done * self.shift - self.offset if done < self.wins else end - self.offset
+        self.rows = {key: trace[keep:].copy() for key, trace in rows.items()}
+        self.offset += keep
+        self.next_window = done
+        return stacks
+
+
+class ChunkedTrace(Trace):
+    ### Trace of a log that is fed in blocks of rows by CSV_log.async_analyze_chunked, memory stays bounded by
+    ### the block size instead of growing with the length of the flight. windows, spectra and histograms are
+    ### the ones of Trace.async_init, the histograms are summed up block by block. the time series are kept for
+    ### the export, only decimated ones (max_points) are bounded. thr_response, resp_sm, resp_quality and
+    ### filter_trans need all windows at once and are not exported, so they are left out. like Trace, only the
+    ### windows and series the requested outputs need are analyzed and kept.
+    vertrange = [-1.5, 3.5]     # binning of the step responses, as in Trace.async_init
+    vertbins = 1000
+
+    def __init__(self, name, start, stop, length, throttle_bands=None, max_points=None, dtype=np.float64, outputs=None):
+        ### start, stop and length of the uniform time scale (see CSV_log.uniform_time) the blocks come in
+        super().__init__({}, throttle_bands, dtype, outputs)
+        self.name = name
+        self.length = length
+        stages = self.stages(self.outputs)
+        self.response = 'response_stack' in stages
+        self.response_hist = 'resp_binning' in stages   # binned responses, only for resp_low, resp_high, resp_throttle
+        self.noise = 'noise' in stages
+
+        head = CSV_log.uniform_time(start, stop, length, 0, min(length, 2))
+        self.dt = head[0] - head[1]
+        self.flen = self.stepcalc(head, Trace.framelen)
+        self.rlen = self.stepcalc(head, Trace.resplen)
+        self.time_resp = CSV_log.uniform_time(start, stop, length, 0, self.rlen) - start
+        self.window = np.hanning(self.flen).astype(self.dtype)
+        shift = int(self.flen / Trace.superpos)
+        self.response_windows = WindowStream(self.flen, shift, int(length / shift) - Trace.superpos)
+
+        self.noise_winlen = self.stepcalc(head, Trace.noise_framelen)
+        self.noise_win = np.hanning(self.noise_winlen).astype(self.dtype)
+        shift = int(self.noise_winlen / Trace.noise_superpos)
+        # slicing off last 2s to get rid of landing, as in Trace.stackspectra
+        cut = int(Trace.noise_superpos * 2. / Trace.noise_framelen)
+        self.noise_windows = WindowStream(self.noise_winlen, shift, int(length / shift) - Trace.noise_superpos - cut)
+
+        self.resp_hist = None       # sums of binned_hist for low, high input and the throttle bands
+        self.high_windows = []      # high input mask of every window
+        self.active_windows = 0     # windows above the noisy low input limit (toolow_mask)
+        self.band_windows = 0       # windows per throttle band
+        self.noise_hist = None      # sums of spectra_hist
+        self.noise_freq = None
+
+        # exported time series, decimated bucket by bucket with max_points (see minmax_decimate)
+        buckets = int(max_points) // 2 if max_points is not None else 0
+        decimate = max_points is not None and length > max_points and buckets >= 1
+        self.series_edges = np.linspace(0, length, buckets + 1).astype(int) if decimate else None
+        self.series_done = 0        # buckets decimated
+        self.series_pending = None  # rows of the buckets in progress
+        self.series = []
+        self.series_names = [name for name in ('gyro', 'input', 'throttle', 'feedforward') if name in self.outputs]
+
+    def push(self, data):
+        ### analyzes the next block of rows, data is the trace dict of the block (see CSV_log.find_traces)
+        rows = {
+            'time': data['time'],
+            'input': self.pid_in(data['p_err'], data['gyro'], data['P']),
+            'gyro': data['gyro'],
+            'throttle': data['throttle'],
+            'd_err': data['d_err'],
+            'debug': data['debug'],
+            'feedforward': data['feedforward'],
+        }
+        self.push_series(rows['time'], np.reshape([rows[name] for name in self.series_names],
+                                                  (len(self.series_names), len(rows['time']))))
+
+        if self.response:
+            stacks = self.response_windows.push({key: rows[key] for key in ('time', 'input', 'gyro', 'throttle')})
+            if len(stacks['time']):
+                self.push_response(stacks)
+        if self.noise:
+            stacks = self.noise_windows.push({key: rows[key] for key in ('time', 'gyro', 'throttle', 'd_err', 'debug')})
+            if len(stacks['time']):
+                self.push_noise(stacks)
+
+    def push_series(self, time, traces):
+        if self.series_edges is None:
+            self.series.append((time, traces))
+            return
+        if self.series_pending is not None:
+            time = np.concatenate([self.series_pending[0], time])
+            traces = np.concatenate([self.series_pending[1], traces], axis=1)
+        offset = self.series_edges[self.series_done]
+        done = np.searchsorted(self.series_edges, offset + len(time), side='right') - 1
+        if done > self.series_done:
+            edges = self.series_edges[self.series_done:done + 1] - offset
+            self.series.append(self.decimate_series(time[:edges[-1]], traces[:, :edges[-1]], edges))
+            time, traces = time[edges[-1]:], traces[:, edges[-1]:]
+            self.series_done = done
+        self.series_pending = (time.copy(), traces.copy())
+
+    def push_response(self, stacks):
+        spec_sm, avr_t, avr_in, max_in, max_thr = self.stack_response(stacks, self.window)
+        # masks of Trace.async_init, their minimum counts over the whole flight are applied in async_finish
+        low_mask = (max_in <= self.threshold).astype(self.dtype)
+        high_mask = 1. - low_mask
+        toolow_mask = (max_in > self.toolow_threshold).astype(self.dtype)
+        weights = np.stack([low_mask * toolow_mask, high_mask * toolow_mask])
+        if self.throttle_bands is not None:
+            band_weights = self.throttle_band_weights(np.asarray(self.throttle_bands, dtype=np.float64),
+                                                      max_thr, toolow_mask)
+            weights = np.concatenate([weights, band_weights])
+            self.band_windows = self.band_windows + band_weights.astype(bool).sum(axis=1)
+
+        if self.response_hist:
+            hist = self.binned_hist(self.response_binning(spec_sm, self.vertrange, self.vertbins), weights)
+            if self.resp_hist is None:
+                self.resp_hist = hist
+            else:
+                self.resp_hist += hist
+        self.high_windows.append(high_mask)
+        self.active_windows += int(toolow_mask.sum())
+
+    def push_noise(self, stacks):
+        self.noise_freq, hist = self.spectra_hist(stacks['time'], stacks['throttle'],
+                                                  [stacks['gyro'], stacks['d_err'], stacks['debug']], self.noise_win)
+        if self.noise_hist is None:
+            self.noise_hist = hist
+        else:
+            self.noise_hist['hist2d'] += hist['hist2d']
+            self.noise_hist['throt_hist'] += hist['throt_hist']
+
+    async def async_finish(self):
+        ### results of the whole flight from the sums of all blocks, after the last push
+        if self.series_pending is not None and len(self.series_pending[0]):
+            edges = self.series_edges[self.series_done:] - self.series_edges[self.series_done]
+            self.series.append(self.decimate_series(self.series_pending[0], self.series_pending[1], edges))
+        self.time = np.concatenate([time for time, _ in self.series])
+        series = dict(zip(self.series_names, np.concatenate([traces for _, traces in self.series], axis=1)))
+        for name in ('gyro', 'input', 'throttle'):
+            if name in series:
+                setattr(self, name, series[name])
+        self.data = {'feedforward': series.get('feedforward')}
+        del self.series
+
+        if self.response:
+            await self.async_finish_response()
+        if self.noise:
+            hist = self.noise_hist
+            hist['hist2d_norm'] = hist['hist2d'] / (hist['throt_hist'] + 1e-9)
+            self.noise_gyro, self.noise_d, self.noise_debug = self.spectra_from_hist(self.noise_freq, hist)
+            del self.noise_hist
+
+    def decimate_series(self, time, traces, edges):
+        decimated_time, *decimated = self.minmax_buckets(time, traces, edges)
+        return decimated_time, np.reshape(decimated, (len(traces), len(decimated_time))).astype(traces.dtype, copy=False)
+
+    async def async_finish_response(self):
+        self.high_mask = np.concatenate(self.high_windows) if self.high_windows else np.zeros(0, dtype=self.dtype)
+        if self.high_mask.sum() < 10:       # ignore high pinput that is too short (see low_high_mask)
+            self.high_mask *= 0.
+        if not self.response_hist:
+            return
+        if self.high_mask.sum() == 0:
+            self.resp_hist[1] = 0.
+        if self.active_windows < 10:
+            self.resp_hist[:] = 0.
+            self.band_windows = 0 * self.band_windows
+        avr, std, (time_resp, resp_y, hist2d_sm) = await self.async_hist_mode_avr(self.resp_hist, self.vertrange,
+                                                                                  self.vertbins)
+        responses = [(avr[i], std[i], [time_resp, resp_y, hist2d_sm[i]]) for i in range(len(avr))]
+        self.resp_low = responses[0]
+        self.resp_high = responses[1]
+        if self.throttle_bands is not None:
+            self.resp_throttle = (avr[2:], std[2:], [time_resp, resp_y, hist2d_sm[2:]])
+            self.resp_throttle_windows = np.broadcast_to(self.band_windows, len(self.throttle_bands) - 1)
+        del self.resp_hist
+
+        self.delay = self.response_delay()
+
+
+class TraceSweep(Trace):
+    ### step responses of one trace for a grid of the analysis parameters in SWEEP, for calibrating them.
+    ### the windows are stacked and transformed once. every cutfreq only redoes the division and inverse
+    ### transform of wiener_deconvolution, every resplen the binning and every threshold only the weighting
+    ### of the windows (see async_binned_mode_avr).
+    SWEEP = ('cutfreq', 'resplen', 'threshold', 'toolow_threshold')
+    vertrange = [-1.5, 3.5]     # binning of the step responses, as in Trace.async_init
+    vertbins = 1000
+
+    def __init__(self, data, dtype=None):
+        super().__init__(data, dtype=dtype, outputs=())
+
+    async def async_init(self):
+        await super().async_init()
+        await self.async_compute('input')
+
+        stacks = self.winstacker({'time':[],'input':[],'gyro':[], 'throttle':[]}, self.flen, Trace.superpos)
+        window = np.hanning(self.flen).astype(self.dtype)
+        inp = stacks['input'] * window
+        # the parts of wiener_deconvolution that do not depend on cutfreq, see stack_response
+        with profiler.stage('deconvolution'):
+            H, G, self.length = self.window_spectra(inp, stacks['gyro'] * window)
+            self.power = H.real**2 + H.imag**2
+            G *= np.conj(H, out=H)
+            self.cross = G
+        del H
+        self.max_thr = np.abs(np.abs(stacks['throttle'] * window)).max(axis=1)
+        self.max_in = np.max(np.abs(inp), axis=1)
+
+    async def async_sweep(self, cutfreq=None, resplen=None, threshold=None, toolow_threshold=None):
+        ### step responses for every combination of the given values (lists, the Trace value for None).
+        ### returns one variant per combination with its parameters, time_resp, resp_low, resp_high (only with
+        ### high input windows), delay and the number of low and high input windows
+        grid = {name: [getattr(Trace, name)] if values is None else [float(value) for value in values]
+                for name, values in zip(self.SWEEP, (cutfreq, resplen, threshold, toolow_threshold))}
+        if max(grid['resplen']) > Trace.framelen:
+            raise ValueError('resplen must not exceed framelen (' + str(Trace.framelen) + ' s)')
+        rlens = [self.stepcalc(self.time, value) for value in grid['resplen']]
+        masks = [(thr, toolow, self.low_high_mask(self.max_in, thr), self.low_high_mask(self.max_in, toolow)[1])
+                 for thr in grid['threshold'] for toolow in grid['toolow_threshold']]
+
+        variants = []
+        for cut in grid['cutfreq']:
+            with profiler.stage('deconvolution'):
+                deconvolved = self.fft.irfft(self.cross / (self.power + 1./self.wiener_mask(self.length, cut)),
+                                             n=self.length, axis=-1)
+                delta_resp = deconvolved[:, :max(rlens)].cumsum(axis=1)
+            del deconvolved
+            for resp, rlen in zip(grid['resplen'], rlens):
+                self.rlen = rlen
+                self.time_resp = self.time[0:rlen]-self.time[0]
+                binning = self.response_binning(delta_resp[:, :rlen], self.vertrange, self.vertbins)
+                for thr, toolow, (low, high), toolow_mask in masks:
+                    # low and high input in one pass, see async_binned_mode_avr
+                    avr, _, _ = await self.async_binned_mode_avr(binning, np.stack([low * toolow_mask,
+                                                                                     high * toolow_mask]))
+                    self.resp_low = (avr[0],)
+                    delay = self.response_delay()
+                    variant = {
+                        'cutfreq': cut,
+                        'resplen': resp,
+                        'threshold': thr,
+                        'toolow_threshold': toolow,
+                        'time_resp': self.time_resp,
+                        'resp_low': avr[0],
+                        'delay': {
+                            'latency_half_height': delay['latency_half_height'],
+                            'half_height_index': int(delay['half_height_index']),
+                            'peak_response': delay['peak_response'],
+                            'peak_time': delay['peak_time'],
+                        },
+                        'windows': {
+                            'low': int((low * toolow_mask).sum()),
+                            'high': int((high * toolow_mask).sum()),
+                        },
+                    }
+                    if high.sum() > 0:
+                        variant['resp_high'] = avr[1]
+                    variants.append(variant)
+        return variants
+
+
+# pyodide has no threads, the axes are only analyzed in parallel on native python. on a single core the
+# threads only add overhead (about 8% measured), so they are left out there too
+PARALLEL_AXES = sys.platform != 'emscripten' and (os.cpu_count() or 1) > 1
+
+class CSV_log:
+    def __init__(self, fpath, headdict, result_path=None, result_format='json', parallel=PARALLEL_AXES, max_points=None,
+                 throttle_bands=None, precision='float64', chunk_rows=None, outputs=None, stream=False,
+                 keep_streamed=False):
+        self.file = fpath                      # path of the csv, or the csv itself as bytes-like buffer
+        self.headdict = dict(headdict)         # copy, find_traces adds tpa_percent to it
+        self.result_path = result_path         # None keeps all results in memory, see write_json
+        self.results = {}
+        self.result_format = result_format     # 'json' or 'binary', see write_result
+        self.parallel = parallel               # analyze roll/pitch/yaw concurrently, see async_analyze
+        self.max_points = max_points           # point budget of exported time series, None for full resolution
+        self.throttle_bands = Trace.resolve_throttle_bands(throttle_bands)  # edges in % for responses per band
+        self.dtype = np.dtype(precision)       # 'float32' halves the memory of the analysis, time stays float64
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError('precision must be float64 or float32, not ' + str(precision))
+        self.chunk_rows = chunk_rows           # read and analyze in blocks of rows, see async_analyze_chunked
+        if chunk_rows is not None and chunk_rows < 2:
+            raise ValueError('chunk_rows must be at least 2, not ' + str(chunk_rows))
+        self.outputs = Trace.resolve_outputs(outputs)  # exported results of every trace, see Trace.OUTPUTS
+        self.stream = stream                   # report results section by section while analyzing, see async_stream_section
+        self.keep_streamed = keep_streamed     # keep reported sections in the results held in memory, e.g. to cache them
+        self.streamed = {}                     # outputs reported per trace name, see async_write_trace
+
+    async def async_init(self):
+        if self.dtype == np.float32:
+            await async_load_single_precision_fft()
+        if self.chunk_rows is None:
+            self.data = await self.async_readcsv(self.file)
+            self.traces = self.find_traces(self.data)
+        else:
+            traces = await self.async_readcsv_chunked(self.file)
+
+        await reportStatusToJs("WRITE_HEADDICT_TO_JSON_START")
+        self.write_json("headdict", self.headdict, indent=4)
+        await reportStatusToJs("WRITE_HEADDICT_TO_JSON_COMPLETE")
+        # TODO: optimize by deleting the headdict file directly after this report
+
+        if self.chunk_rows is None:
+            await self.async_analyze()
+        else:
+            await self.async_analyze_chunked(traces)
+
+    async def async_analyze(self):
+        await reportStatusToJs("ANALYZE_PID_START")
+
+        if self.parallel:
+            ### axes are independent, all of them are analyzed at once in worker threads (numpy releases the GIL).
+            ### results are awaited, written and reported in axis order, so files and status events stay the same.
+            with ThreadPoolExecutor(max_workers=len(self.traces)) as executor:
+                loop = asyncio.get_running_loop()
+                pending = [loop.run_in_executor(executor, self.analyze_trace, trace_data, self.throttle_bands,
+                                                 self.outputs)
+                           for trace_data in self.traces]
+                for trace_data, pending_trace in zip(self.traces, pending):
+                    await reportStatusToJs("ANALYZE_PID_TRACE_START", trace_data['name'])
+                    trace = await pending_trace
+                    await self.async_stream_trace(trace)
+                    await self.async_write_trace(trace_data, trace)
+                    del trace
+        else:
+            for trace_data in self.traces:
+                logging.info(trace_data['name'] + '...   ')
+                await reportStatusToJs("ANALYZE_PID_TRACE_START", trace_data['name'])
+                logging.info('trace constructor')
+                trace = Trace(trace_data, self.throttle_bands, outputs=self.outputs)
+
+                logging.info('trace async init')
+                await trace.async_init(self.async_stream_section)
+                await self.async_write_trace(trace_data, trace)
+                del trace
+
+        await reportStatusToJs("ANALYZE_PID_COMPLETE")
+
+    async def async_analyze_chunked(self, traces):
+        ### like async_analyze for the ChunkedTraces of async_readcsv_chunked, which are fed with the whole log
+        ### already. the results of every axis are computed from the sums of all blocks and written in axis order
+        await reportStatusToJs("ANALYZE_PID_START")
+
+        for index, trace in enumerate(traces):
+            await reportStatusToJs("ANALYZE_PID_TRACE_START", trace.name)
+            await trace.async_finish()
+            await self.async_stream_trace(trace)
+            await self.async_write_trace({'name': trace.name}, trace)
+            traces[index] = None
+
+        await reportStatusToJs("ANALYZE_PID_COMPLETE")
+
+    @staticmethod
+    def analyze_trace(trace_data, throttle_bands=None, outputs=None):
+        ### runs the analysis of one axis with its own event loop, used by the worker threads of async_analyze
+        logging.info(trace_data['name'] + '...   ')
+        trace = Trace(trace_data, throttle_bands, outputs=outputs)
+        asyncio.run(trace.async_init())
+        return trace
+
+    async def async_stream_section(self, trace, section):
+        ### with stream, reports the results of a section of trace (see Trace.SECTIONS) as soon as they are
+        ### computed, as ANALYZE_PID_TRACE_RESULT [name, section, json, bin] in the format of write_result
+        if not self.stream or not any(output in trace.outputs for output in Trace.SECTIONS[section]):
+            return
+        result_json, result_bin = self.encode_result(trace.to_result_object(self.max_points, Trace.SECTIONS[section]))
+        await reportStatusToJs("ANALYZE_PID_TRACE_RESULT", [trace.name, section, result_json, result_bin])
+        self.streamed.setdefault(trace.name, set()).update(Trace.SECTIONS[section])
+
+    async def async_stream_trace(self, trace):
+        ### all sections of a trace analyzed apart from the event loop (worker threads, blocks of rows)
+        for section in Trace.SECTIONS:
+            await self.async_stream_section(trace, section)
+
+    async def async_write_trace(self, trace_data, trace):
+        logging.info('trace to ' + self.result_format)
+        outputs = None
+        if self.result_path is None and not self.keep_streamed and trace_data['name'] in self.streamed:
+            # the caller has the streamed sections already, only the rest is encoded again
+            outputs = [output for output in trace.outputs if output not in self.streamed[trace_data['name']]]
+        self.write_result("trace_" + trace_data['name'], trace.to_result_object(self.max_points, outputs))
+        # TODO: optimize by reading the trace file directly after this report
+        # and then deleting the file from memory
+        await reportStatusToJs("ANALYZE_PID_TRACE_COMPLETE", trace_data['name'])
+
+    @profiled('export')
+    def write_result(self, name, result):
+        ### writes result as name.json, for result_format 'binary' only as manifest of the arrays in name.bin
+        if self.result_format == 'binary':
+            manifest, buffers = to_binary(result)
+            if self.result_path is None:
+                self.results[name] = {'bin': b''.join(buffers)}
+            else:
+                with open(self.result_path + "/" + name + ".bin", 'wb') as bin_file:
+                    for buffer in buffers:
+                        bin_file.write(buffer)
+            self.write_json(name, manifest)
+        else:
+            self.write_json(name, to_json(result), indent=4)
+
+    @profiled('export')
+    def encode_result(self, result):
+        ### json (for result_format 'binary' the manifest of the arrays) and binary data (None for 'json') of a
+        ### result, as write_result keeps them without result_path
+        if self.result_format == 'binary':
+            manifest, buffers = to_binary(result)
+            return json.dumps(manifest, ensure_ascii=False), b''.join(buffers)
+        return json.dumps(to_json(result), ensure_ascii=False), None
+
+    def write_json(self, name, result, indent=None):
+        ### writes name.json to result_path, without result_path it is kept in self.results[name]['json']
+        result_json = json.dumps(result, ensure_ascii=False, indent=indent)
+        if self.result_path is None:
+            self.results.setdefault(name, {})['json'] = result_json
+        else:
+            with open(self.result_path + "/" + name + ".json", 'w', encoding='utf-8') as json_file:
+                json_file.write(result_json)
+
+    def open_csv(self):
+        ### binary file object of the csv, also for csv buffers
+        if isinstance(self.file, str):
+            return open(self.file, 'rb')
+        return io.BufferedReader(BufferReader(self.file))
+
+    async def async_readcsv(self, fpath):
+        await reportStatusToJs("READING_CSV_START")
+
+        if (os.path.getsize(fpath) if isinstance(fpath, str) else len(fpath)) == 0:
+            logging.error('File is empty: ' + str(self.headdict['logNum']))
+            await reportStatusToJs("ERROR", "No Headers in log")
+            sys.exit(1)
+    
+        logging.info('Reading: Log '+str(self.headdict['logNum']))
+        columns, usecols = self.csv_columns()
+        with self.open_csv() as csv_file, profiler.stage('read_csv'):
+            time, block = next(self.read_blocks(csv_file, columns, usecols))
+        time, block = await self.async_equalize(time, block)
+        data = {columns[index]: block[block_index] for block_index, index in enumerate(usecols)}
+        datdic = self.select_traces(self.trace_columns(data.keys()), data, time)
+
+        del data
+        await reportStatusToJs("READING_CSV_COMPLETE")
+        return datdic
+
+    async def async_readcsv_chunked(self, fpath):
+        ### reads the log in blocks of chunk_rows rows. every block is equalized to the uniform time scale of
+        ### async_equalize and fed to one ChunkedTrace per axis right away, so only one block is held at once.
+        ### returns the ChunkedTraces of roll, pitch and yaw
+        await reportStatusToJs("READING_CSV_START")
+
+        if (os.path.getsize(fpath) if isinstance(fpath, str) else len(fpath)) == 0:
+            logging.error('File is empty: ' + str(self.headdict['logNum']))
+            await reportStatusToJs("ERROR", "No Headers in log")
+            sys.exit(1)
+
+        logging.info('Reading: Log '+str(self.headdict['logNum']) + ' in blocks of ' + str(self.chunk_rows) + ' rows')
+        columns, usecols = self.csv_columns()
+
+        # the uniform time scale needs first and last time and the number of rows up front, only time is read for them
+        start, stop, length = None, None, 0
+        with self.open_csv() as csv_file, profiler.stage('read_csv'):
+            for time, _ in self.read_blocks(csv_file, columns, [columns.index('time (us)')], self.chunk_rows):
+                if len(time):
+                    start = time[0] if start is None else start
+                    stop = time[-1]
+                    length += len(time)
+        if length < 2:
+            await reportStatusToJs("ERROR", "No data for equalization!")
+            logging.warning('log No data for equalization!')
+            sys.exit(1)
+
+        traces = None
+        names = None
+        carry = None        # last row of the last block, the first rows of a block are interpolated from it
+        read = 0
+        done = 0            # rows of the uniform time scale fed so far
+        with self.open_csv() as csv_file:
+            blocks = self.read_blocks(csv_file, columns, usecols, self.chunk_rows)
+            while True:
+                with profiler.stage('read_csv'):
+                    time, block = next(blocks, (None, None))
+                    if time is None:
+                        break
+                read += len(time)
+                if carry is not None:
+                    time = np.concatenate([carry[0], time])
+                    block = np.concatenate([carry[1], block], axis=1)
+                carry = (time[-1:], block[:, -1:].copy())
+
+                with profiler.stage('equalize'):
+                    # the points of the time scale before the last row of the block, all remaining ones for the last
+                    end = length if read == length else \
+                        min(length, int((time[-1] - start) / (stop - start) * (length - 1)) + 2)
+                    newtime = self.uniform_time(start, stop, length, done, end)
+                    if read < length:
+                        newtime = newtime[:np.searchsorted(newtime, time[-1], side='left')]
+                    block = self.interpolate(time, block, newtime)
+                if len(newtime) == 0:
+                    continue
+                done += len(newtime)
+
+                data = {columns[index]: block[block_index] for block_index, index in enumerate(usecols)}
+                if names is None:
+                    names = self.trace_columns(data.keys())
+                block_traces = self.find_traces(self.select_traces(names, data, newtime))
+                if traces is None:
+                    traces = [ChunkedTrace(trace_data['name'], start, stop, length, self.throttle_bands, self.max_points,
+                                           self.dtype, self.outputs) for trace_data in block_traces]
+                for trace, trace_data in zip(traces, block_traces):
+                    trace.push(trace_data)
+                del data, block_traces
+
+        await reportStatusToJs("READING_CSV_COMPLETE")
+        return traces
+
+    def csv_columns(self):
+        ### all columns of the csv, and the indices of the ones the analysis reads
+        ### keycheck for 'usecols' only reads usefull traces, uncommend if needed
+        wanted =  ['time (us)',
+                   'rcCommand[0]', 'rcCommand[1]', 'rcCommand[2]', 'rcCommand[3]',
+                   'axisP[0]','axisP[1]','axisP[2]',
+                   'axisI[0]', 'axisI[1]', 'axisI[2]',
+                   'axisD[0]', 'axisD[1]','axisD[2]',
+                   'axisF[0]', 'axisF[1]', 'axisF[2]',
+                   'gyroADC[0]', 'gyroADC[1]', 'gyroADC[2]',
+                   'gyroData[0]', 'gyroData[1]', 'gyroData[2]',
+                   'ugyroADC[0]', 'ugyroADC[1]', 'ugyroADC[2]',
+                   'debug[0]', 'debug[1]', 'debug[2]','debug[3]',
+                   'gyroUnfilt[0]', 'gyroUnfilt[1]', 'gyroUnfilt[2]'
+                   ]
+        ### resolve the wanted columns from the header line once, only those are parsed
+        with self.open_csv() as csv_file:
+            columns = read_header(csv_file)
+        return columns, [index for index, name in enumerate(columns) if name in wanted]
+
+    def read_blocks(self, csv_file, columns, usecols, block_rows=None):
+        ### time in s (float64) and one block of self.dtype with one row per column of usecols, for every
+        ### block_rows rows of the csv (one block of all rows for None), see read_columns
+        return read_columns(csv_file, usecols, columns.index('time (us)'), self.dtype, block_rows)
+
+    def trace_columns(self, names):
+        ### column of the log for every trace of find_traces, out of the column names read. None for missing
+        ### traces, which are analyzed as zeros
+        traces = {'throttle': 'rcCommand[3]'}
+
+        for i in ['0', '1', '2']:
+            traces['rcCommand' + i] = 'rcCommand['+i+']'
+            if 'axisF[' + i + ']' in names:
+                traces['axisF' + i] = 'axisF[' + i + ']'
+            else:
+                logging.warning('No feedforward['+str(i)+'] trace found!')
+                traces['axisF' + i] = None
+
+            if 'debug[' + i + ']' in names:
+                traces['debug' + i] = 'debug[' + i + ']'
+            else:
+                logging.warning('No debug['+str(i)+'] trace found!')
+                traces['debug' + i] = None
+
+            # overwrite debug values with gyroUnfilt values if available
+            if 'gyroUnfilt[' + i + ']' in names:
+                traces['debug' + i] = 'gyroUnfilt[' + i + ']'
+            else:
+                logging.warning('No gyroUnfilt['+str(i)+'] trace found, guess this is not BF >=4.5 :)')
+
+            # get P trace (including case of missing trace)
+            if 'axisP[' + i + ']' in names:
+                traces['PID loop in' + i] = 'axisP[' + i + ']'
+            else:
+                logging.warning('No P['+str(i)+'] trace found!')
+                traces['PID loop in' + i] = None
+
+            if 'axisD[' + i + ']' in names:
+                traces['d_err' + i] = 'axisD[' + i + ']'
+            else:
+                logging.warning('No D['+str(i)+'] trace found!')
+                traces['d_err' + i] = None
+
+            if 'axisI[' + i + ']' in names:
+                traces['I_term' + i] = 'axisI[' + i + ']'
+            else:
+                if i != '2':
+                    logging.warning('No I['+str(i)+'] trace found!')
+                traces['I_term' + i] = None
+
+            if 'gyroADC[0]' in names:
+                traces['gyroData' + i] = 'gyroADC[' + i+']'
+            elif 'gyroData[0]' in names:
+                traces['gyroData' + i] = 'gyroData[' + i+']'
+            elif 'ugyroADC[0]' in names:
+                traces['gyroData' + i] = 'ugyroADC[' + i+']'
+            else:
+                logging.warning('No gyro trace found!')
+
+        return traces
+
+    def select_traces(self, traces, data, time):
+        ### the traces of find_traces from the columns in data, see trace_columns
+        zeros = np.broadcast_to(self.dtype.type(0.), (len(time),))     # shared read-only stand-in for missing traces
+        datdic = {'time_us': time}
+        datdic.update({name: zeros if column is None else data[column] for name, column in traces.items()})
+        return datdic
+
+    @profiled('equalize')
+    async def async_equalize(self, time, block):
+        ### equalizes time scale of all traces, one trace per row of block.
+        ### linear interpolation to the uniform time scale, indices and weights are computed once for all rows.
+        if len(time) < 2:
+            await reportStatusToJs("ERROR", "No data for equalization!")
+            logging.warning('log No data for equalization!')
+            sys.exit(1)
+
+        newtime = np.linspace(time[0], time[-1], len(time), dtype=np.float64)
+        return newtime, self.interpolate(time, block, newtime)
+
+    @staticmethod
+    def uniform_time(start, stop, length, first, end):
+        ### rows first:end of np.linspace(start, stop, length) (the time scale of async_equalize), bit for bit
+        time = np.arange(first, end, dtype=np.float64) * ((stop - start) / (length - 1)) + start
+        if end == length and end > first:
+            time[-1] = stop
+        return time
+
+    @staticmethod
+    def interpolate(time, block, newtime):
+        ### linear interpolation of the rows of block from time to newtime (within the range of time)
+        lower = np.searchsorted(time, newtime, side='right') - 1
+        lower = lower.clip(0, len(time) - 2)
+        weight = ((newtime - time[lower]) / (time[lower + 1] - time[lower])).astype(block.dtype, copy=False)
+
+        lower_values = np.take(block, lower, axis=1)
+        equalized = np.take(block, lower + 1, axis=1)
+        equalized -= lower_values
+        equalized *= weight
+        equalized += lower_values
+        return equalized
+
+    def find_traces(self, dat):
+        time = dat['time_us']
+        throttle = dat['throttle']
+
+        throt = ((throttle - 1000.) / (float(self.headdict['maxThrottle']) - 1000.)) * 100.
+
+        traces = [{'name':'roll'},{'name':'pitch'},{'name':'yaw'}]
+
+        for trace_index, trace_dic in enumerate(traces):
+            trace_dic.update({'time':time})
+            trace_dic.update({'p_err':dat['PID loop in'+str(trace_index)]})
+            trace_dic.update({'rcinput': dat['rcCommand' + str(trace_index)]})
+            trace_dic.update({'feedforward': dat['axisF' + str(trace_index)]})
+            trace_dic.update({'gyro':dat['gyroData'+str(trace_index)]})
+            trace_dic.update({'d_err': dat['d_err' + str(trace_index)]})
+            trace_dic.update({'debug': dat['debug' + str(trace_index)]})
+            if 'KISS' in self.headdict['fwType']:
+                trace_dic.update({'P': 1.})
+                self.headdict.update({'tpa_percent': 0.})
+            elif 'Raceflight' in self.headdict['fwType']:
+                trace_dic.update({'P': 1.})
+                self.headdict.update({'tpa_percent': 0.})
+
+            else:
+                trace_dic.update({'P':float((self.headdict[trace_dic['name']+'PID']).split(',')[0])})
+                self.headdict.update({'tpa_percent': (float(self.headdict['tpa_breakpoint']) - 1000.) / 10.})
+
+            trace_dic.update({'throttle':throt})
+
+        return traces
+
+
+def to_json(result):
+    ### converts all ndarrays of a result object to lists
+    if isinstance(result, dict):
+        return {key: to_json(value) for key, value in result.items()}
+    if isinstance(result, list):
+        return [to_json(value) for value in result]
+    if isinstance(result, np.ndarray):
+        return result.tolist()
+    if isinstance(result, np.generic):
+        return result.item()        # e.g. float32 scalars, which json can not serialize
+    return result
+
+def to_binary(result, buffers=None, offset=0):
+    ### splits a result object into a json manifest and little-endian array buffers to be written back to back.
+    ### each ndarray is replaced by {'__ndarray__': dtype, 'shape': shape, 'offset': byte offset in the buffers},
+    ### offsets are 8 byte aligned so the js side can map them straight into typed arrays.
+    top_level = buffers is None
+    if top_level:
+        buffers = []
+    if isinstance(result, dict):
+        manifest = {}
+        for key, value in result.items():
+            manifest[key], offset = to_binary(value, buffers, offset)
+    elif isinstance(result, np.ndarray):
+        array = np.ascontiguousarray(result, dtype=result.dtype.newbyteorder('<'))
+        manifest = {'__ndarray__': array.dtype.name, 'shape': list(array.shape), 'offset': offset}
+        buffers.append(array.data)
+        offset += array.nbytes
+        if offset % 8:
+            buffers.append(bytes(8 - offset % 8))
+            offset += 8 - offset % 8
+    else:
+        manifest = to_json(result)
+    if top_level:
+        return manifest, buffers
+    return manifest, offset
+
+def write_results(result_path, results):
+    ### writes in-memory results of CSV_log ({name: {'json': str, 'bin': bytes}}) as name.json / name.bin files
+    for name, result in results.items():
+        with open(result_path + "/" + name + ".json", 'w', encoding='utf-8') as json_file:
+            json_file.write(result['json'])
+        if 'bin' in result:
+            with open(result_path + "/" + name + ".bin", 'wb') as bin_file:
+                bin_file.write(result['bin'])
+
+async def async_analyze_flight(log_csv, header_dict, result_path=None, result_format='json', cache=None, max_points=None,
+                               throttle_bands=None, precision='float64', chunk_rows=None, outputs=None,
+                               stream=False, parallel=PARALLEL_AXES):
+    ### analyzes one decoded flight log, entry point of the js side (which imports this package once).
+    ### log_csv is a path or the csv as bytes-like buffer. results are written to result_path, or, without
+    ### result_path, returned as {name: {'json': str, 'bin': bytes}} for headdict and trace_roll/pitch/yaw.
+    ### with a cache (ResultCache or directory path) the results of an already analyzed log are reused.
+    ### max_points decimates the exported time series for display (see Trace.minmax_decimate),
+    ### throttle_bands adds step responses per throttle band (see Trace.throttle_band_weights).
+    ### precision 'float32' runs the analysis in single precision with half the memory (see CSV_log).
+    ### chunk_rows reads and analyzes the log in blocks of rows, for logs too long to be held in memory
+    ### (see CSV_log.async_analyze_chunked), peak memory is then bounded with max_points.
+    ### outputs selects the exported results of every trace (names of Trace.OUTPUTS, None for all), only the
+    ### stages of the analysis they need are run.
+    ### stream reports the results of every trace section by section while analyzing, as ANALYZE_PID_TRACE_RESULT
+    ### (see CSV_log.async_stream_section). the returned traces then leave out the reported sections, results
+    ### written to result_path or the cache stay complete. results taken from the cache are not streamed.
+    ### parallel analyzes the axes concurrently (see CSV_log.async_analyze).
+    ### with profiling switched on (see set_profiling) the results also contain the stage report as 'profile'.
+    await reportStatusToJs("START")
+    profiler.reset()
+
+    if result_path is not None and not os.path.exists(result_path):
+        os.makedirs(result_path)
+
+    log = None
+    try:
+        with profiler.stage('flight'):
+            cache = open_cache(cache)
+            if cache is None:
+                log = CSV_log(log_csv, header_dict, result_path, result_format, max_points=max_points,
+                              throttle_bands=throttle_bands, parallel=parallel, precision=precision,
+                              chunk_rows=chunk_rows, outputs=outputs, stream=stream)
+                await log.async_init()
+                results = log.results
+            else:
+                key = ResultCache.key(log_csv, {
+                    'version': ANALYZER_VERSION,
+                    'trace': Trace.parameters(),
+                    'header': header_dict,
+                    'format': result_format,
+                    'max_points': max_points,
+                    'throttle_bands': throttle_bands,
+                    'precision': precision,
+                    'outputs': list(Trace.resolve_outputs(outputs)),
+                })
+                results = cache.get(key)
+                if results is None:
+                    log = CSV_log(log_csv, header_dict, None, result_format, max_points=max_points,
+                                  throttle_bands=throttle_bands, parallel=parallel, precision=precision,
+                                  chunk_rows=chunk_rows, outputs=outputs, stream=stream, keep_streamed=True)
+                    await log.async_init()
+                    results = log.results
+                    cache.put(key, results)
+                else:
+                    logging.info('cached results ' + key)
+                    await reportStatusToJs("CACHE_HIT", key)
+
+                if result_path is not None:
+                    write_results(result_path, results)
+                    results = {}
+
+        if profiler.enabled:
+            profile = {'profile': {'json': json.dumps(profiler.report(), indent=4)}}
+            if result_path is None:
+                results.update(profile)
+            else:
+                write_results(result_path, profile)
+        await reportStatusToJs("COMPLETE")
+        return results
+    except Exception as e:
+        logging.error('Error: ' + str(e))
+        await reportStatusToJs("ERROR", str(e))
+        raise e
+    finally:
+        del log
+
+def analyze_flight(log_csv, header_dict, result_path, options, profiling=(False, False)):
+    ### runs async_analyze_flight in a worker process of async_analyze_flights. the flights already use all cores,
+    ### so the axes of each flight are analyzed one after another. profiling is switched like in the main process.
+    ### returns the results, the status reports of the flight and the error (None if it succeeded)
+    set_profiling(*profiling)
+    reports = record_status()
+    try:
+        return asyncio.run(async_analyze_flight(log_csv, header_dict, result_path, **{**options, 'parallel': False})), \
+            reports, None
+    except Exception as e:
+        return None, reports, str(e)
+
+async def async_analyze_flights(flights, result_path=None, max_workers=None, **options):
+    ### analyzes a batch of flights [(log_csv, header_dict), ...], options are passed on to async_analyze_flight.
+    ### native python spreads the flights over a process pool sized to the cores, on emscripten (no processes,
+    ### the js side schedules flights on a pool of pyodide workers instead) or with max_workers=1 they run in turn.
+    ### between BATCH_START and BATCH_COMPLETE every flight is reported in flight order as FLIGHT_START, the
+    ### reports of async_analyze_flight and FLIGHT_COMPLETE or FLIGHT_ERROR with its index. in the process pool
+    ### the reports of a flight are passed on together, once it and the flights before it are done.
+    ### returns the results in flight order, None for failed flights. result_path gets a sub directory per flight.
+    await reportStatusToJs("BATCH_START", len(flights))
+
+    def flight_result_path(index):
+        return None if result_path is None else os.path.join(result_path, str(index))
+
+    results = []
+    if sys.platform == 'emscripten' or max_workers == 1 or len(flights) < 2:
+        for index, (log_csv, header_dict) in enumerate(flights):
+            await reportStatusToJs("FLIGHT_START", index)
+            try:
+                results.append(await async_analyze_flight(log_csv, header_dict, flight_result_path(index), **options))
+                await reportStatusToJs("FLIGHT_COMPLETE", index)
+            except Exception as e:
+                results.append(None)
+                await reportStatusToJs("FLIGHT_ERROR", [index, str(e)])
+    else:
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count() or 1, len(flights))) as executor:
+            pending = [loop.run_in_executor(executor, analyze_flight,
+                                            log_csv if isinstance(log_csv, str) else bytes(log_csv), header_dict,
+                                            flight_result_path(index), options, (profiler.enabled, profiler.memory))
+                       for index, (log_csv, header_dict) in enumerate(flights)]
+            for index, pending_flight in enumerate(pending):
+                try:
+                    result, reports, error = await pending_flight
+                except Exception as e:      # the worker process died
+                    result, reports, error = None, [], str(e)
+                await reportStatusToJs("FLIGHT_START", index)
+                for status, payload in reports:
+                    await reportStatusToJs(status, payload)
+                results.append(result)
+                if error is None:
+                    await reportStatusToJs("FLIGHT_COMPLETE", index)
+                else:
+                    logging.error('Error: ' + error)
+                    await reportStatusToJs("FLIGHT_ERROR", [index, error])
+
+    await reportStatusToJs("BATCH_COMPLETE")
+    return results
+
+async def async_sweep_flight(log_csv, header_dict, cutfreq=None, resplen=None, threshold=None, toolow_threshold=None,
+                             precision='float64'):
+    ### step responses of one decoded flight log for every combination of the given analysis parameters (lists,
+    ### see TraceSweep.SWEEP, the Trace value for None), e.g. to calibrate the thresholds for a class of quads.
+    ### the log is read, stacked and transformed once for all of them (see TraceSweep).
+    ### returns {'sweep': {'json': str}} with the variants of roll, pitch and yaw (see TraceSweep.async_sweep)
+    await reportStatusToJs("START")
+    profiler.reset()
+
+    try:
+        with profiler.stage('flight'):
+            log = CSV_log(log_csv, header_dict, precision=precision)
+            if log.dtype == np.float32:
+                await async_load_single_precision_fft()
+            traces = log.find_traces(await log.async_readcsv(log_csv))
+            del log
+
+            await reportStatusToJs("ANALYZE_PID_START")
+            result = {}
+            for trace_data in traces:
+                await reportStatusToJs("ANALYZE_PID_TRACE_START", trace_data['name'])
+                sweep = TraceSweep(trace_data)
+                await sweep.async_init()
+                result[trace_data['name']] = await sweep.async_sweep(cutfreq, resplen, threshold, toolow_threshold)
+                del sweep
+                await reportStatusToJs("ANALYZE_PID_TRACE_COMPLETE", trace_data['name'])
+            await reportStatusToJs("ANALYZE_PID_COMPLETE")
+
+        results = {'sweep': {'json': json.dumps(to_json(result), ensure_ascii=False)}}
+        if profiler.enabled:
+            results['profile'] = {'json': json.dumps(profiler.report(), indent=4)}
+        await reportStatusToJs("COMPLETE")
+        return results
+    except Exception as e:
+        logging.error('Error: ' + str(e))
+        await reportStatusToJs("ERROR", str(e))
+        raise e
@@ -0,0 +1,48 @@
+import io
+
+LINE_SCAN_BYTES = 4096
+
+
+class BufferReader(io.RawIOBase):
+    ### read-only binary file object over a bytes-like buffer, e.g. a log handed over from the js side.
+    ### only the requested bytes are copied, so file based readers work on in-memory logs without a full copy.
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer).cast('B')
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.buffer)
+        self.position = min(max(offset, 0), len(self.buffer))
+        return self.position
+
+    def readinto(self, target):
+        size = min(len(target), len(self.buffer) - self.position)
+        target[:size] = self.buffer[self.position:self.position + size]
+        self.position += size
+        return size
+
+    def readline(self, size=-1):
+        end = len(self.buffer) if size is None or size < 0 else min(len(self.buffer), self.position + size)
+        line = b''
+        while self.position < end:
+            chunk = bytes(self.buffer[self.position:min(end, self.position + LINE_SCAN_BYTES)])
+            newline = chunk.find(b'\n')
+            if newline != -1:
+                chunk = chunk[:newline + 1]
+            line += chunk
+            self.position += len(chunk)
+            if newline != -1:
+                break
+        return line
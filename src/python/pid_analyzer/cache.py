@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import struct
+from collections import OrderedDict
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024     # size bound of a result store, least recently used entries go first
+HASH_CHUNK_BYTES = 1 << 20                  # read size when hashing logs from files
+ENTRY_SUFFIX = '.result'
+
+
+class DirectoryStore:
+    ### result store with one file per entry in path, e.g. a local directory for native runs or a directory
+    ### mounted on IDBFS in the browser. the modification time marks the last use of an entry.
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        try:
+            with open(self.entry_path(key), 'rb') as entry_file:
+                data = entry_file.read()
+            os.utime(self.entry_path(key))
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key, data):
+        # written aside and renamed, so concurrent analyses (see async_analyze_flights) never read partial entries
+        temp_path = '%s.%d.tmp' % (self.entry_path(key), os.getpid())
+        with open(temp_path, 'wb') as entry_file:
+            entry_file.write(data)
+        os.replace(temp_path, self.entry_path(key))
+        self.evict()
+
+    def evict(self):
+        ### removes least recently used entries until the store fits into max_bytes
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.path, name))
+                except FileNotFoundError:      # evicted by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith(ENTRY_SUFFIX):
+                os.remove(os.path.join(self.path, name))
+
+
+class MemoryStore:
+    ### result store kept in memory for the lifetime of the process
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total = 0
+
+    def get(self, key):
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        if key in self.entries:
+            self.total -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.total += len(data)
+        while self.total > self.max_bytes and self.entries:
+            self.total -= len(self.entries.popitem(last=False)[1])
+
+    def clear(self):
+        self.entries.clear()
+        self.total = 0
+
+
+class ResultCache:
+    ### analysis results of flight logs, addressed by the content of the log and everything else the results
+    ### depend on (see async_analyze_flight). any object with get(key) -> bytes or None and put(key, bytes)
+    ### can be used as store.
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def key(log, parameters):
+        ### sha256 of the log (path or bytes-like buffer) and the json of the parameters
+        digest = hashlib.sha256()
+        if isinstance(log, str):
+            with open(log, 'rb') as log_file:
+                for chunk in iter(lambda: log_file.read(HASH_CHUNK_BYTES), b''):
+                    digest.update(chunk)
+        else:
+            digest.update(memoryview(log).cast('B'))
+        digest.update(json.dumps(parameters, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        data = self.store.get(key)
+        if data is None:
+            return None
+        return unpack_results(data)
+
+    def put(self, key, results):
+        self.store.put(key, pack_results(results))
+
+
+def open_cache(cache):
+    ### cache as ResultCache, a directory path is opened as DirectoryStore
+    if cache is None or isinstance(cache, ResultCache):
+        return cache
+    if isinstance(cache, str):
+        return ResultCache(DirectoryStore(cache))
+    return ResultCache(cache)
+
+def pack_results(results):
+    ### {name: {'json': str, 'bin': bytes}} as one blob: length of the index, index json, binary data back to back
+    index = {}
+    buffers = []
+    offset = 0
+    for name, result in results.items():
+        index[name] = {'json': result['json']}
+        if 'bin' in result:
+            index[name]['bin'] = [offset, len(result['bin'])]
+            buffers.append(result['bin'])
+            offset += len(result['bin'])
+    index_json = json.dumps(index, ensure_ascii=False).encode('utf-8')
+    return b''.join([struct.pack('<Q', len(index_json)), index_json] + buffers)
+
+def unpack_results(data):
+    index_length, = struct.unpack_from('<Q', data)
+    index = json.loads(bytes(data[8:8 + index_length]).decode('utf-8'))
+    data_start = 8 + index_length
+    results = {}
+    for name, entry in index.items():
+        results[name] = {'json': entry['json']}
+        if 'bin' in entry:
+            offset, length = entry['bin']
+            results[name]['bin'] = bytes(data[data_start + offset:data_start + offset + length])
+    return results
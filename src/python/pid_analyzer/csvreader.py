@@ -0,0 +1,55 @@
+import itertools
+import numpy as np
+
+### numpy-only reader for the csv of decoded logs (blackbox_decode), in place of pandas.read_csv.
+BLOCK_ROWS = 65536      # rows parsed at once, bounds the double precision parse buffer
+
+
+def read_header(csv_file):
+    ### column names of the header line of a binary file object
+    return [name.strip() for name in csv_file.readline().decode('latin-1').split(',')]
+
+
+def count_lines(csv_file, chunk_bytes=1 << 20):
+    ### number of lines from the position of a seekable binary file object on, the position is kept
+    start = csv_file.tell()
+    lines = 0
+    last = b'\n'
+    for chunk in iter(lambda: csv_file.read(chunk_bytes), b''):
+        lines += chunk.count(b'\n')
+        last = chunk[-1:]
+    csv_file.seek(start)
+    return lines + (last != b'\n')
+
+
+def read_columns(csv_file, usecols, time_column, dtype, block_rows=None):
+    ### parses the columns usecols of the rows after the header line of a binary file object, in blocks of
+    ### block_rows rows (one block of all rows for None). yields per block the time (us) of column time_column
+    ### in s as float64 and one row of dtype per column of usecols. float32 cannot resolve microseconds after
+    ### the first 16s, so time is kept apart.
+    ### for one block of all rows the file must be seekable, the rows are counted first and parsed into
+    ### arrays of that size, so the parsed blocks are never held next to their concatenation
+    csv_file.readline()
+    if block_rows is None:
+        rows = count_lines(csv_file)
+        time = np.empty(rows, dtype=np.float64)
+        block = np.empty((len(usecols), rows), dtype=dtype)
+    filled = 0
+    while True:
+        lines = list(itertools.islice(csv_file, block_rows or BLOCK_ROWS))
+        if not lines:
+            break
+        values = np.loadtxt(lines, delimiter=',', usecols=usecols, dtype=np.float64, ndmin=2)
+        del lines
+        if block_rows is None:
+            time[filled:filled + len(values)] = values[:, usecols.index(time_column)] * 1e-6
+            block[:, filled:filled + len(values)] = values.T
+            filled += len(values)
+        else:
+            yield values[:, usecols.index(time_column)] * 1e-6, values.T.astype(dtype, order='C')
+        del values
+
+    if block_rows is None:
+        if filled < rows:       # blank lines, loadtxt skips them
+            time, block = time[:filled].copy(), np.ascontiguousarray(block[:, :filled])
+        yield time, block
@@ -0,0 +1,84 @@
+import importlib
+import logging
+import sys
+import numpy as np
+
+### numpy-only replacements of the scipy functions the analysis used, so scipy is not needed to run it.
+### scipy is only imported on demand for the single precision fft of numpy < 2 (see single_precision_fft).
+
+FILTER_BLOCK = 32       # columns smoothed at once by gaussian_filter1d, keeps the working set in the cpu cache
+
+# np.fft keeps single precision from numpy 2 on, before it transforms float32 in double precision
+NUMPY_SINGLE_PRECISION_FFT = np.lib.NumpyVersion(np.__version__) >= '2.0.0'
+
+
+def gaussian_kernel(sigma, radius):
+    ### normalized gaussian weights for the offsets -radius..radius, as scipy.ndimage builds them
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 / (sigma * sigma) * x ** 2)
+    return kernel / kernel.sum()
+
+
+def gaussian_filter1d(values, sigma, axis=-1, mode='reflect', truncate=4.0):
+    ### gaussian smoothing along axis like scipy.ndimage.gaussian_filter1d, for the modes 'reflect'
+    ### (d c b a | a b c d | d c b a) and 'constant' (zeros). sums in double precision in the order scipy
+    ### does (center, then symmetric pairs outwards), the result has the dtype of values.
+    values = np.asarray(values)
+    axis = axis % values.ndim
+    if axis != values.ndim - 1 and values.shape[-1] > FILTER_BLOCK:
+        smoothed = np.empty(values.shape, dtype=values.dtype)
+        for start in range(0, values.shape[-1], FILTER_BLOCK):
+            smoothed[..., start:start + FILTER_BLOCK] = gaussian_filter1d(values[..., start:start + FILTER_BLOCK],
+                                                                          sigma, axis, mode, truncate)
+        return smoothed
+
+    radius = int(truncate * float(sigma) + 0.5)
+    kernel = gaussian_kernel(float(sigma), radius)
+    length = values.shape[axis]
+
+    padding = [(0, 0)] * values.ndim
+    padding[axis] = (radius, radius)
+    if mode == 'reflect':
+        padded = np.pad(values.astype(np.float64, copy=False), padding, mode='symmetric')
+    elif mode == 'constant':
+        padded = np.pad(values.astype(np.float64, copy=False), padding, mode='constant')
+    else:
+        raise ValueError('mode must be reflect or constant, not ' + str(mode))
+
+    def shifted(offset):
+        ### padded values offset samples away from every sample along axis
+        index = [slice(None)] * values.ndim
+        index[axis] = slice(radius + offset, radius + offset + length)
+        return padded[tuple(index)]
+
+    smoothed = shifted(0) * kernel[radius]
+    pair = np.empty_like(smoothed)
+    for offset in range(1, radius + 1):
+        np.add(shifted(offset), shifted(-offset), out=pair)
+        pair *= kernel[radius + offset]
+        smoothed += pair
+    return smoothed.astype(values.dtype, copy=False)
+
+
+async def async_load_single_precision_fft():
+    ### makes single_precision_fft available. pyodide (numpy < 2) does not install scipy up front (see
+    ### PyodideRuntime), it is fetched on the first float32 analysis. logs and goes on without it if it can not be loaded
+    if NUMPY_SINGLE_PRECISION_FFT or sys.platform != 'emscripten' or 'scipy' in sys.modules:
+        return
+    try:
+        import pyodide_js
+        await pyodide_js.loadPackage('scipy')
+    except Exception as e:
+        logging.warning('scipy could not be loaded: ' + str(e))
+
+
+def single_precision_fft():
+    ### fft module for float32 analysis: np.fft from numpy 2 on, before scipy.fft, which keeps single precision.
+    ### without scipy np.fft, which then transforms in double precision
+    if NUMPY_SINGLE_PRECISION_FFT:
+        return np.fft
+    try:
+        return importlib.import_module('scipy.fft')
+    except ImportError:
+        logging.warning('scipy not available, float32 analysis transforms in double precision')
+        return np.fft
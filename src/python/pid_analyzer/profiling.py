@@ -0,0 +1,116 @@
+import functools
+import inspect
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Profiler:
+    ### records wall time, cpu time (of the running thread) and peak traced memory per stage of the analysis.
+    ### off by default, switched at runtime by set_profiling. memory tracing (tracemalloc) slows python code
+    ### down considerably and is global to the process, so stages running concurrently (e.g. the axes in
+    ### CSV_log.async_analyze) see each others allocations.
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.records = []
+        self.active = []            # stages in progress, nested and concurrent ones, for the memory peaks
+        self.lock = threading.Lock()
+
+    def enable(self, memory=True):
+        if self.memory and not memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+
+    def reset(self):
+        with self.lock:
+            self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        frame = {'peak': 0, 'start_bytes': 0}
+        if self.memory:
+            with self.lock:
+                # the peak so far belongs to all running stages, then it is reset for the new one
+                self.track_peak()
+                frame['start_bytes'] = tracemalloc.get_traced_memory()[0]
+                self.active.append(frame)
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.thread_time() - start_cpu
+            with self.lock:
+                if self.memory:
+                    self.track_peak()
+                    self.active.remove(frame)
+                self.records.append({
+                    'stage': name,
+                    'thread': threading.current_thread().name,
+                    'wall': wall,
+                    'cpu': cpu,
+                    'peak_bytes': max(frame['peak'] - frame['start_bytes'], 0),
+                })
+
+    def track_peak(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self.active:
+            frame['peak'] = max(frame['peak'], peak)
+        tracemalloc.reset_peak()
+
+    def report(self):
+        ### totals per stage in order of first appearance, and every single record
+        stages = {}
+        with self.lock:
+            records = list(self.records)
+        for record in records:
+            stage = stages.setdefault(record['stage'], {'calls': 0, 'wall': 0., 'cpu': 0., 'peak_bytes': 0})
+            stage['calls'] += 1
+            stage['wall'] += record['wall']
+            stage['cpu'] += record['cpu']
+            stage['peak_bytes'] = max(stage['peak_bytes'], record['peak_bytes'])
+        return {'memory': self.memory, 'stages': stages, 'records': records}
+
+
+profiler = Profiler()
+
+def set_profiling(enabled, memory=True):
+    ### switches the profiling of all following analyses on or off, see Profiler
+    if enabled:
+        profiler.enable(memory)
+    else:
+        profiler.disable()
+    profiler.reset()
+
+def profiled(name):
+    ### records every call of the decorated function or coroutine function as stage name
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with profiler.stage(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with profiler.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,310 @@
+import logging
+import os
+import json
+from .buffers import BufferReader
+from .profiling import profiled, profiler
+from .status import reportStatusToJs
+
+LOG_MIN_BYTES = 500000
+
+async def async_split_bbl_old(bbl_path, out_path):
+    await reportStatusToJs("SPLITTING_BBL")
+    with open(bbl_path, 'rb') as binary_log_view:
+        content = binary_log_view.read()
+
+    # The first line of the overall BBL file re-appears at the beginning
+    # of each recorded session.
+    try:
+        first_newline_index = content.index(str('\n').encode('utf8'))
+    except ValueError as e:
+        raise ValueError('No newline in') from e
+
+    firstline = content[:first_newline_index + 1]
+
+    raw_logs = content.split(firstline)
+
+    sub_bbl_file_names = []
+    for log_index, raw_log in enumerate(raw_logs):
+        _, path_ext = os.path.splitext(os.path.basename(bbl_path))
+        sub_bbl_path = os.path.join(out_path, f"{log_index}{path_ext}")
+
+        with open(sub_bbl_path, 'wb') as sub_bbl:
+            sub_bbl.write(firstline + raw_log)
+        sub_bbl_file_names.append(sub_bbl_path)
+        logging.info('Wrote %s', sub_bbl_path)
+
+    sub_bbl_count = len(sub_bbl_file_names)
+    logging.info('Split %s into %s sub-bbl files', bbl_path, sub_bbl_count)
+    await reportStatusToJs("BBLS_SPLITTED", sub_bbl_count)
+
+    return sub_bbl_file_names
+
+# the first line of every recorded session contains: H Product:Blackbox flight data recorder by Nicholas Sherlock
+LOG_START_MARKER = b'H Product:Blackbox flight data recorder by Nicholas Sherlock'
+READ_CHUNK_BYTES = 1024 * 1024
+
+@profiled('split')
+def find_log_sessions(binary_log_view):
+    ### returns (offset, length) of every session in the log, scanning it chunk by chunk for LOG_START_MARKER.
+    ### bytes before the first marker do not belong to any session.
+    marker_offsets = []
+    carry = b''
+    carry_offset = 0
+    binary_log_view.seek(0)
+    while True:
+        chunk = binary_log_view.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        block = carry + chunk
+        index = block.find(LOG_START_MARKER)
+        while index != -1:
+            marker_offsets.append(carry_offset + index)
+            index = block.find(LOG_START_MARKER, index + len(LOG_START_MARKER))
+        # keep the tail that could be the start of a marker crossing into the next chunk
+        keep = min(len(block), len(LOG_START_MARKER) - 1)
+        carry = block[len(block) - keep:]
+        carry_offset += len(block) - keep
+
+    log_end = carry_offset + len(carry)
+    session_ends = marker_offsets[1:] + [log_end]
+    return [(offset, end - offset) for offset, end in zip(marker_offsets, session_ends)]
+
+def copy_byte_range(source, target, offset, length):
+    ### copies length bytes at offset of source to target without holding more than one chunk in memory
+    source.seek(offset)
+    while length > 0:
+        chunk = source.read(min(length, READ_CHUNK_BYTES))
+        if not chunk:
+            break
+        target.write(chunk)
+        length -= len(chunk)
+
+async def async_split_bbl(bbl_path, out_path):
+    await reportStatusToJs("SPLITTING_BBL")
+
+    sub_bbl_file_names = []
+    with open(bbl_path, 'rb') as binary_log_view:
+        sessions = find_log_sessions(binary_log_view)
+
+        # sessions are numbered from 1, like the parts after the (always empty) first split part before
+        for log_index, (offset, length) in enumerate(sessions, start=1):
+            _, path_ext = os.path.splitext(os.path.basename(bbl_path))
+            sub_bbl_path = os.path.join(out_path, f"{log_index}{path_ext}")
+
+            with open(sub_bbl_path, 'wb') as sub_bbl:
+                copy_byte_range(binary_log_view, sub_bbl, offset, length)
+            sub_bbl_file_names.append(sub_bbl_path)
+            logging.info('Wrote %s', sub_bbl_path)
+
+    sub_bbl_count = len(sub_bbl_file_names)
+    logging.info('Split %s into %s sub-bbl files', bbl_path, sub_bbl_count)
+    await reportStatusToJs("BBLS_SPLITTED", sub_bbl_count)
+
+    return sub_bbl_file_names
+
+
+# different versions of fw have different names for the same thing.
+# keys are the exact header names, i.e. the part between 'H ' and the first ':'.
+HEADER_TRANSLATION = {
+    'dynThrPID'                          : 'dynThrottle',
+    'Craft name'                         : 'craftName',
+    'Firmware type'                      : 'fwType',
+    'Firmware revision'                  : 'version',
+    'Firmware date'                      : 'fwDate',
+    'rcRate'                             : 'rcRate',
+    'rc_rate'                            : 'rcRate',
+    'rcExpo'                             : 'rcExpo',
+    'rc_expo'                            : 'rcExpo',
+    'rcYawExpo'                          : 'rcYawExpo',
+    'rc_expo_yaw'                        : 'rcYawExpo',
+    'rcYawRate'                          : 'rcYawRate',
+    'rc_rate_yaw'                        : 'rcYawRate',
+    'rates'                              : 'rates',
+    'rollPID'                            : 'rollPID',
+    'pitchPID'                           : 'pitchPID',
+    'yawPID'                             : 'yawPID',
+    'deadband'                           : 'deadBand',
+    'yaw_deadband'                       : 'yawDeadBand',
+    'tpa_breakpoint'                     : 'tpa_breakpoint',
+    'minthrottle'                        : 'minThrottle',
+    'maxthrottle'                        : 'maxThrottle',
+    'dtermSetpointWeight'                : 'dTermSetPoint',
+    'dterm_setpoint_weight'              : 'dTermSetPoint',
+    'vbat_pid_compensation'              : 'vbatComp',
+    'vbat_pid_gain'                      : 'vbatComp',
+    'gyro_lpf'                           : 'gyro_lpf',
+    'gyro_lowpass_type'                  : 'gyro_lowpass_type',
+    'gyro_lowpass_hz'                    : 'gyro_lowpass_hz',
+    'gyro_lpf_hz'                        : 'gyro_lowpass_hz',
+    'gyro_notch_hz'                      : 'gyro_notch_hz',
+    'gyro_notch_cutoff'                  : 'gyro_notch_cutoff',
+    'dterm_filter_type'                  : 'dterm_filter_type',
+    'dterm_lpf_hz'                       : 'dterm_lpf_hz',
+    'yaw_lpf_hz'                         : 'yaw_lpf_hz',
+    'dterm_notch_hz'                     : 'dterm_notch_hz',
+    'dterm_notch_cutoff'                 : 'dterm_notch_cutoff',
+    'debug_mode'                         : 'debug_mode',
+    'simplified_master_multiplier'       : 'simplified_master_multiplier',
+    'simplified_i_gain'                  : 'simplified_i_gain',
+    'simplified_d_gain'                  : 'simplified_d_gain',
+    'simplified_pi_gain'                 : 'simplified_pi_gain',
+    'simplified_dmax_gain'               : 'simplified_dmax_gain',
+    'simplified_feedforward_gain'        : 'simplified_feedforward_gain',
+    'simplified_pitch_d_gain'            : 'simplified_pitch_d_gain',
+    'simplified_pitch_pi_gain'           : 'simplified_pitch_pi_gain',
+    'simplified_dterm_filter'            : 'simplified_dterm_filter',
+    'simplified_dterm_filter_multiplier' : 'simplified_dterm_filter_multiplier',
+    'simplified_gyro_filter'             : 'simplified_gyro_filter',
+    'simplified_gyro_filter_multiplier'  : 'simplified_gyro_filter_multiplier'
+}
+
+HEADER_LINE_PREFIX = b'H '
+MAX_HEADER_LINE_BYTES = 4096
+
+def read_header_lines(sub_bbl_file):
+    ### yields (key, value) of the leading 'H key:value' lines, stops at the first frame that is no header line.
+    ### like before, the value is what follows the last ':' of the line.
+    while True:
+        raw_line = sub_bbl_file.readline(MAX_HEADER_LINE_BYTES)
+        if not raw_line.startswith(HEADER_LINE_PREFIX):
+            return
+        decoded_line = raw_line[len(HEADER_LINE_PREFIX):].decode('latin-1')
+        header_key, separator, header_value = decoded_line.partition(':')
+        if not separator:
+            continue
+        header_value = header_value.split(':')[-1]
+        if header_value.endswith('\n'):
+            header_value = header_value[:-1]
+        yield header_key, header_value
+
+@profiled('header')
+def read_log_header(sub_bbl_file, sub_bbl_index):
+    ### reads the header dict of one session, sub_bbl_file is positioned at the start of the session
+    ### in case info is not provided by log, empty str is printed in plot
+    header = {
+        'tempFile'          :'',
+        'dynThrottle'       :'',
+        'craftName'         :'',
+        'fwType'            :'',
+        'version'           :'',
+        'date'              :'',
+        'rcRate'            :'',
+        'rcExpo'            :'',
+        'rcYawExpo'         :'',
+        'rcYawRate'         :'',
+        'rates'             :'',
+        'rollPID'           :'',
+        'pitchPID'          :'',
+        'yawPID'            :'',
+        'deadBand'          :'',
+        'yawDeadBand'       :'',
+        'logNum'            :'',
+        'tpa_breakpoint'    :'0',
+        'minThrottle'       :'',
+        'maxThrottle'       :'',
+        'tpa_percent'       :'',
+        'dTermSetPoint'     :'',
+        'vbatComp'          :'',
+        'gyro_lpf'          :'',
+        'gyro_lowpass_type' :'',
+        'gyro_lowpass_hz'   :'',
+        'gyro_notch_hz'     :'',
+        'gyro_notch_cutoff' :'',
+        'dterm_filter_type' :'',
+        'dterm_lpf_hz'      :'',
+        'yaw_lpf_hz'        :'',
+        'dterm_notch_hz'    :'',
+        'dterm_notch_cutoff':'',
+        'debug_mode'        :'',
+        'simplified_master_multiplier'      : '',
+        'simplified_i_gain'                 : '',
+        'simplified_d_gain'                 : '',
+        'simplified_pi_gain'                : '',
+        'simplified_dmax_gain'              : '',
+        'simplified_feedforward_gain'       : '',
+        'simplified_pitch_d_gain'           : '',
+        'simplified_pitch_pi_gain'          : '',
+        'simplified_dterm_filter'           : '',
+        'simplified_dterm_filter_multiplier': '',
+        'simplified_gyro_filter'            : '',
+        'simplified_gyro_filter_multiplier' : ''
+    }
+
+    header['logNum'] = str(sub_bbl_index)
+    ### check for known keys and translate to useful ones.
+    for header_key, header_value in read_header_lines(sub_bbl_file):
+        if header_key in HEADER_TRANSLATION:
+            header[HEADER_TRANSLATION[header_key]] = header_value
+
+    return header
+
+async def async_get_log_header(sub_bbl_filename_list):
+    await reportStatusToJs("READING_HEADERS_START", len(sub_bbl_filename_list))
+
+    all_header = []
+    for sub_bbl_index, sub_bbl_filename in enumerate(sub_bbl_filename_list):
+        await reportStatusToJs("READING_HEADERS_FROM_SUB_BBL_START", sub_bbl_index)
+
+        with open(sub_bbl_filename, 'rb') as sub_bbl_file:
+            header = read_log_header(sub_bbl_file, sub_bbl_index)
+        header['tempFile'] = sub_bbl_filename
+
+        all_header.append(header)
+        await reportStatusToJs("READING_HEADERS_FROM_SUB_BBL_COMPLETE", sub_bbl_index)
+
+    await reportStatusToJs("READING_HEADERS_COMPLETE")
+    return all_header
+
+async def async_split_bbl_buffer(bbl_buffer):
+    ### splits a bbl held in memory (bytes-like, e.g. handed over from js) without writing any files.
+    ### returns header, offset and length of every session, the caller slices the sessions from its own buffer.
+    ### with profiling switched on (see set_profiling) the stage report is sent as PROFILE (json) before COMPLETE.
+    await reportStatusToJs("RUNNING")
+    profiler.reset()
+    await reportStatusToJs("SPLITTING_BBL")
+    binary_log_view = BufferReader(bbl_buffer)
+    sessions = find_log_sessions(binary_log_view)
+    logging.info('Split buffer into %s sessions', len(sessions))
+    await reportStatusToJs("BBLS_SPLITTED", len(sessions))
+
+    await reportStatusToJs("READING_HEADERS_START", len(sessions))
+    split_result = []
+    for sub_bbl_index, (offset, length) in enumerate(sessions):
+        await reportStatusToJs("READING_HEADERS_FROM_SUB_BBL_START", sub_bbl_index)
+        binary_log_view.seek(offset)
+        split_result.append({
+            'header': read_log_header(binary_log_view, sub_bbl_index),
+            'offset': offset,
+            'length': length,
+        })
+        await reportStatusToJs("READING_HEADERS_FROM_SUB_BBL_COMPLETE", sub_bbl_index)
+    await reportStatusToJs("READING_HEADERS_COMPLETE")
+
+    if profiler.enabled:
+        await reportStatusToJs("PROFILE", json.dumps(profiler.report()))
+    await reportStatusToJs("COMPLETE")
+    return split_result
+
+async def async_split_bbl_file(bbl_path, out_path, json_file_name):
+    ### splits a bbl file into sub-bbl files in out_path, headers and file names go to json_file_name
+    logging.info('Decoding BBL file: %s', bbl_path)
+
+    os.makedirs(out_path, exist_ok=True)
+
+    await reportStatusToJs("RUNNING")
+    sub_bbl_filenames = await async_split_bbl(bbl_path, out_path)
+    all_sub_bbl_headers = await async_get_log_header(sub_bbl_filenames)
+
+    combined_json_output = []
+    for index, header in enumerate(all_sub_bbl_headers):
+        combined_json_output.append({
+            'header': header,
+            'bbl_filename': sub_bbl_filenames[index],
+        })
+
+    with open(json_file_name, 'w', encoding='utf-8') as json_file:
+        json_file.write(json.dumps(combined_json_output, indent=4, sort_keys=True))
+    json_file.close()
+
+    await reportStatusToJs("COMPLETE")
+
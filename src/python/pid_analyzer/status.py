@@ -0,0 +1,27 @@
+import logging
+
+try:
+    # registered by the js side (see PyodideRuntime in pyodide.ts)
+    from js_status import reportStatusToJs as reportToJs
+except ImportError:
+    reportToJs = None
+
+recorded = None     # reports of a worker process are collected here instead, see record_status
+
+
+async def reportStatusToJs(status, payload=None):
+    if recorded is not None:
+        recorded.append((status, payload))
+    elif reportToJs is not None:
+        await reportToJs(status, payload)
+    else:
+        ### native python has no js side to report to, status only goes to the log
+        logging.debug('status: %s %s', status, '' if payload is None else payload)
+
+
+def record_status():
+    ### collects the reports of this process from now on in the returned list instead of reporting them,
+    ### for worker processes whose reports are passed on by the main process (see analyze_flight)
+    global recorded
+    recorded = []
+    return recorded
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+import argparse
+import asyncio
+import json
+import logging
+from pid_analyzer import async_sweep_flight
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Step responses of one decoded blackbox flight log for a grid of '
+                                                 'analysis parameters, the log is only read and transformed once.')
+    parser.add_argument('csv', help='decoded flight log (.csv)')
+    parser.add_argument('header', help='log header (.json), as produced by split-bbl.py')
+    parser.add_argument('-o', '--result', default='sweep.json', help='output json with the variants of every trace')
+    parser.add_argument('--cutfreq', type=float, nargs='+', metavar='HZ', help='cut frequencies of the input')
+    parser.add_argument('--resplen', type=float, nargs='+', metavar='S', help='lengths of the step response')
+    parser.add_argument('--threshold', type=float, nargs='+', help='thresholds for high input')
+    parser.add_argument('--toolow-threshold', type=float, nargs='+', help='thresholds below which input is ignored')
+    parser.add_argument('-p', '--precision', choices=['float64', 'float32'], default='float64',
+                        help='precision of the analysis, float32 needs half the memory')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+    format='%(levelname)s %(asctime)s %(filename)s:%(lineno)s: %(message)s',
+    level=logging.INFO)
+
+    with open(args.header, 'r', encoding='utf-8') as header_file:
+        header_dict = json.load(header_file)
+
+    results = asyncio.run(async_sweep_flight(args.csv, header_dict, args.cutfreq, args.resplen, args.threshold,
+                                             args.toolow_threshold, args.precision))
+    with open(args.result, 'w', encoding='utf-8') as result_file:
+        result_file.write(results['sweep']['json'])
+
+
+if __name__ == '__main__':
+    main()
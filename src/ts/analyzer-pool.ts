@@ -0,0 +1,253 @@
+import {
+  AnalyzeOneFlightStep,
+  DecoderResult,
+  PIDAnalyzerArray,
+  PIDAnalyzerOptions,
+  PIDAnalyzerResult,
+} from "./types";
+
+type Profiling = { enabled: boolean; memory: boolean };
+
+export type AnalyzerWorkerRequest =
+  | { type: "init"; fileOrigin?: string; profiling: Profiling }
+  | ({ type: "profiling" } & Profiling)
+  | {
+      type: "analyze";
+      id: number;
+      decoderResult: DecoderResult;
+      options: PIDAnalyzerOptions;
+    };
+
+export type AnalyzerWorkerResponse =
+  | { type: "ready" }
+  // the runtime of the worker could not be set up, e.g. pyodide or a package failed to load
+  | { type: "error"; message: string }
+  | {
+      type: "status";
+      id: number;
+      status: AnalyzeOneFlightStep;
+      payload: any;
+    }
+  | {
+      type: "result";
+      id: number;
+      result: PIDAnalyzerResult<PIDAnalyzerArray> | null;
+    };
+
+// every worker holds a complete pyodide runtime with numpy, and scipy once it analyzed a flight in float32
+// (a few hundred MB), so the pool stays below the core count of big machines by default
+const MAX_DEFAULT_WORKERS = 4;
+
+// ms a worker may take to load its runtime before it counts as failed, loading pyodide on a slow connection
+// takes a while
+const WORKER_START_TIMEOUT = 120000;
+
+// runs flights concurrently, each on its own pyodide runtime in a web worker (see analyzer-worker.ts).
+// the python side has no processes on emscripten, so this is the browser counterpart of async_analyze_flights
+export class AnalyzerWorkerPool {
+  private readonly fileOrigin?: string;
+  private readonly size: number;
+  private workers: Promise<Worker>[] = [];
+  private nextFlightId = 0;
+  private profiling: Profiling = { enabled: false, memory: false };
+
+  public constructor(fileOrigin?: string, size?: number) {
+    this.fileOrigin = fileOrigin;
+    this.size =
+      size ??
+      Math.min(
+        typeof navigator !== "undefined" ? navigator.hardwareConcurrency || 1 : 1,
+        MAX_DEFAULT_WORKERS
+      );
+  }
+
+  private startWorker(): Promise<Worker> {
+    const worker = new Worker(new URL("./analyzer-worker.ts", import.meta.url), {
+      type: "module",
+    });
+
+    const started = new Promise<Worker>((resolve, reject) => {
+      const settle = () => {
+        clearTimeout(timer);
+        worker.removeEventListener("message", onReady);
+        worker.removeEventListener("error", onError);
+      };
+      const onReady = (event: MessageEvent<AnalyzerWorkerResponse>) => {
+        if (event.data.type === "ready") {
+          settle();
+          resolve(worker);
+        } else if (event.data.type === "error") {
+          onError(new Error(event.data.message));
+        }
+      };
+      const onError = (error: Event | Error) => {
+        settle();
+        worker.terminate();
+        reject(error);
+      };
+      const timer = setTimeout(
+        () => onError(new Error(`not ready within ${WORKER_START_TIMEOUT} ms`)),
+        WORKER_START_TIMEOUT
+      );
+      worker.addEventListener("message", onReady);
+      worker.addEventListener("error", onError);
+      worker.postMessage({
+        type: "init",
+        fileOrigin: this.fileOrigin,
+        profiling: this.profiling,
+      } as AnalyzerWorkerRequest);
+    });
+    // failed starts are reported by analyze, setProfiling and terminate skip these workers
+    started.catch(() => undefined);
+
+    return started;
+  }
+
+  // resolves with the result of the flight, rejects when the worker crashes (e.g. out of memory), can not pass
+  // a message or does not answer within timeout ms. the worker is unusable then, see analyze
+  private analyzeOnWorker(
+    worker: Worker,
+    request: Extract<AnalyzerWorkerRequest, { type: "analyze" }>,
+    onStatus?: (status: AnalyzeOneFlightStep, payload: any) => any,
+    timeout?: number
+  ): Promise<PIDAnalyzerResult<PIDAnalyzerArray> | null> {
+    return new Promise((resolve, reject) => {
+      let timer: ReturnType<typeof setTimeout> | undefined;
+      const settle = () => {
+        clearTimeout(timer);
+        worker.removeEventListener("message", onMessage);
+        worker.removeEventListener("error", onError);
+        worker.removeEventListener("messageerror", onError);
+      };
+      const onMessage = (event: MessageEvent<AnalyzerWorkerResponse>) => {
+        const response = event.data;
+        if (
+          response.type === "ready" ||
+          response.type === "error" ||
+          response.id !== request.id
+        ) {
+          return;
+        }
+
+        // events of one flight arrive in the order python reported them, they all come from one worker
+        if (response.type === "status") {
+          onStatus?.(response.status, response.payload);
+          return;
+        }
+
+        settle();
+        resolve(response.result);
+      };
+      const onError = (event: Event) => {
+        settle();
+        reject(event);
+      };
+      worker.addEventListener("message", onMessage);
+      worker.addEventListener("error", onError);
+      worker.addEventListener("messageerror", onError);
+      if (timeout !== undefined) {
+        timer = setTimeout(() => {
+          settle();
+          reject(new Error(`no result within ${timeout} ms`));
+        }, timeout);
+      }
+      worker.postMessage(request);
+    });
+  }
+
+  // analyzes all flights, results are in flight order with null for failed flights.
+  // a worker that crashes or exceeds flightTimeout (ms, no limit without it) fails its flight and is
+  // replaced by a new one, workers that can not be started are dropped
+  public async analyze(
+    decoderResults: DecoderResult[],
+    onStatus?: (
+      status: AnalyzeOneFlightStep,
+      flightLogIndex: number,
+      payload: any
+    ) => any,
+    options: PIDAnalyzerOptions = {},
+    flightTimeout?: number
+  ): Promise<(PIDAnalyzerResult<PIDAnalyzerArray> | null)[]> {
+    const workerCount = Math.min(this.size, decoderResults.length);
+    while (this.workers.length < workerCount) {
+      this.workers.push(this.startWorker());
+    }
+
+    const results: (PIDAnalyzerResult<PIDAnalyzerArray> | null)[] = new Array(
+      decoderResults.length
+    ).fill(null);
+    const failedWorkers = new Set<Promise<Worker>>();
+    let nextIndex = 0;
+
+    // every worker takes the next flight as soon as it is done with its last one
+    await Promise.all(
+      Array.from({ length: workerCount }, async (_, slot) => {
+        while (nextIndex < decoderResults.length) {
+          const pendingWorker = this.workers[slot];
+          let worker: Worker;
+          try {
+            worker = await pendingWorker;
+          } catch (e) {
+            console.warn(`Analyzer worker ${slot} could not be started`, e);
+            failedWorkers.add(pendingWorker);
+            return;
+          }
+
+          const index = nextIndex++;
+          results[index] = await this.analyzeOnWorker(
+            worker,
+            {
+              type: "analyze",
+              id: this.nextFlightId++,
+              decoderResult: decoderResults[index],
+              options,
+            },
+            (status, payload) => onStatus?.(status, index, payload),
+            flightTimeout
+          ).catch((e) => {
+            console.warn(
+              `Analysis of flight ${index} failed, restarting its worker`,
+              e
+            );
+            worker.terminate();
+            this.workers[slot] = this.startWorker();
+            return null;
+          });
+        }
+      })
+    );
+
+    this.workers = this.workers.filter(
+      (pendingWorker) => !failedWorkers.has(pendingWorker)
+    );
+
+    return results;
+  }
+
+  // switches the stage profiler of all workers, also of those started later
+  public setProfiling(enabled: boolean, memory: boolean) {
+    this.profiling = { enabled, memory };
+    this.workers.forEach((pendingWorker) =>
+      pendingWorker.then(
+        (worker) =>
+          worker.postMessage({
+            type: "profiling",
+            enabled,
+            memory,
+          } as AnalyzerWorkerRequest),
+        () => undefined
+      )
+    );
+  }
+
+  public terminate() {
+    const workers = this.workers;
+    this.workers = [];
+    workers.forEach((pendingWorker) =>
+      pendingWorker.then(
+        (worker) => worker.terminate(),
+        () => undefined
+      )
+    );
+  }
+}
@@ -0,0 +1,66 @@
+import type {
+  AnalyzerWorkerRequest,
+  AnalyzerWorkerResponse,
+} from "./analyzer-pool";
+import { PythonAnalyzer } from "./python-analyser";
+
+// one pyodide runtime per web worker, flights are scheduled onto the workers by AnalyzerWorkerPool
+let analyzer: PythonAnalyzer | undefined;
+
+function post(response: AnalyzerWorkerResponse, transfer: Transferable[] = []) {
+  (self as unknown as Worker).postMessage(response, transfer);
+}
+
+// the buffers behind all typed arrays of a result, moved to the main thread instead of copied
+function collectBuffers(value: any, buffers = new Set<ArrayBufferLike>()) {
+  if (ArrayBuffer.isView(value)) {
+    buffers.add(value.buffer);
+  } else if (value !== null && typeof value === "object") {
+    Object.values(value).forEach((entry) => collectBuffers(entry, buffers));
+  }
+
+  return buffers;
+}
+
+self.onmessage = async (event: MessageEvent<AnalyzerWorkerRequest>) => {
+  const request = event.data;
+
+  if (request.type === "init") {
+    // the IDBFS result cache is not shared between runtimes, syncing it from several workers would drop entries
+    analyzer = new PythonAnalyzer(request.fileOrigin, false);
+    try {
+      await analyzer.init();
+      if (request.profiling.enabled) {
+        await analyzer.setProfiling(true, request.profiling.memory);
+      }
+    } catch (e) {
+      // a rejection would go unnoticed by the pool, which waits for ready
+      post({ type: "error", message: String(e) });
+      return;
+    }
+    post({ type: "ready" });
+    return;
+  }
+
+  if (request.type === "profiling") {
+    await analyzer!.setProfiling(request.enabled, request.memory);
+    return;
+  }
+
+  const { id, decoderResult, options } = request;
+  const result = await analyzer!
+    .analyzeOneFlight(
+      decoderResult,
+      (status, payload) => post({ type: "status", id, status, payload }),
+      options
+    )
+    .catch((e) => {
+      console.warn(`Analysis of flight ${id} failed`, e);
+      return null;
+    });
+
+  post(
+    { type: "result", id, result },
+    Array.from(collectBuffers(result)) as Transferable[]
+  );
+};
@@ -1,20 +1,68 @@
 export enum PYTHON_ANALYZER_CODE_NAMES {
-  SPLIT_BBL = "split-bbl.py",
-  ANALYZE_ONE_FLIGHT = "analyze-one-flight.py",
+  PID_ANALYZER_INIT = "pid_analyzer/__init__.py",
+  PID_ANALYZER_STATUS = "pid_analyzer/status.py",
+  PID_ANALYZER_BUFFERS = "pid_analyzer/buffers.py",
+  PID_ANALYZER_CACHE = "pid_analyzer/cache.py",
+  PID_ANALYZER_PROFILING = "pid_analyzer/profiling.py",
+  PID_ANALYZER_NUMERIC = "pid_analyzer/numeric.py",
+  PID_ANALYZER_CSVREADER = "pid_analyzer/csvreader.py",
+  PID_ANALYZER_ANALYZER = "pid_analyzer/analyzer.py",
+  PID_ANALYZER_SPLITTER = "pid_analyzer/splitter.py",
 }
 
+// modules of the pid_analyzer python package, installed once into the runtime (see PyodideRuntime.loadPackage)
+export const PID_ANALYZER_PACKAGE_MODULES = [
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_INIT,
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_STATUS,
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_BUFFERS,
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_CACHE,
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_PROFILING,
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_NUMERIC,
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_CSVREADER,
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_ANALYZER,
+  PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_SPLITTER,
+];
+
 export async function loadCode(
   name: PYTHON_ANALYZER_CODE_NAMES
 ): Promise<string> {
   // TODO: update build pipeline to insert code here
   let code: string | undefined;
   switch (name) {
-    case PYTHON_ANALYZER_CODE_NAMES.SPLIT_BBL: {
-      code = `${/* GEN_PY_CODE<split-bbl.py> */ ""}`.trim();
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_INIT: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/__init__.py> */ ""}`.trim();
+      break;
+    }
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_STATUS: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/status.py> */ ""}`.trim();
+      break;
+    }
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_BUFFERS: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/buffers.py> */ ""}`.trim();
+      break;
+    }
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_CACHE: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/cache.py> */ ""}`.trim();
+      break;
+    }
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_PROFILING: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/profiling.py> */ ""}`.trim();
+      break;
+    }
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_NUMERIC: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/numeric.py> */ ""}`.trim();
+      break;
+    }
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_CSVREADER: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/csvreader.py> */ ""}`.trim();
+      break;
+    }
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_ANALYZER: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/analyzer.py> */ ""}`.trim();
       break;
     }
-    case PYTHON_ANALYZER_CODE_NAMES.ANALYZE_ONE_FLIGHT: {
-      code = `${/* GEN_PY_CODE<analyze-one-flight.py> */ ""}`.trim();
+    case PYTHON_ANALYZER_CODE_NAMES.PID_ANALYZER_SPLITTER: {
+      code = `${/* GEN_PY_CODE<pid_analyzer/splitter.py> */ ""}`.trim();
       break;
     }
     default: {
@@ -43,8 +43,9 @@ export class Decoder {
     await this.load();
   }
 
-  public async decodeBlackbox(blackbox: ArrayBuffer): Promise<{content: string, fileName: string}[]> {
-    await this.BlackboxDecodeModule.FS.writeFile("/logfile.bbl", blackbox);
+  public async decodeBlackbox(blackbox: ArrayBuffer | Uint8Array): Promise<{content: string, fileName: string}[]> {
+    const blackboxBytes = blackbox instanceof Uint8Array ? blackbox : new Uint8Array(blackbox);
+    await this.BlackboxDecodeModule.FS.writeFile("/logfile.bbl", blackboxBytes);
 
     await this.BlackboxDecodeModule._decode();
 
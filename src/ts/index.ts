@@ -1,11 +1,20 @@
 // @ts-ignore
 import { Decoder } from "./decoder";
-import { PythonAnalyzer } from "./python-analyser";
+import { AnalyzerWorkerPool } from "./analyzer-pool";
+import { PythonAnalyzer, checkThrottleBands } from "./python-analyser";
 import {
   AnalyzeOneFlightStep,
   AnalyzeOneFlightStepToPayloadMap,
   DecoderResult,
+  PIDAnalyzerBatchOptions,
+  PIDAnalyzerOptions,
+  PIDAnalyzerPrecision,
   PIDAnalyzerResult,
+  PIDAnalyzerResultArray,
+  PIDAnalyzerResultFormat,
+  PIDAnalyzerSweepGrid,
+  PIDAnalyzerSweepResult,
+  PIDAnalyzerTraceSection,
   SplitBBLStep,
   SplitBBLStepToPayloadMap,
 } from "./types";
@@ -15,8 +24,23 @@ export {
   AnalyzeOneFlightStep,
   AnalyzeOneFlightStepToPayloadMap,
   PIDAnalyzerHeaderInformation,
+  PIDAnalyzerArray,
+  PIDAnalyzerBatchOptions,
+  PIDAnalyzerOptions,
+  PIDAnalyzerOutput,
+  PIDAnalyzerPrecision,
   PIDAnalyzerResult,
+  PIDAnalyzerResultArray,
+  PIDAnalyzerProfile,
+  PIDAnalyzerProfileStage,
+  PIDAnalyzerResultFormat,
+  PIDAnalyzerSweepGrid,
+  PIDAnalyzerSweepResult,
+  PIDAnalyzerSweepVariant,
+  PIDAnalyzerThrottleResponse,
   PIDAnalyzerTraceData,
+  PIDAnalyzerTraceSection,
+  PIDAnalyzerTraceSectionName,
 } from "./types";
 
 export type PIDAnalyzeStatusHandler = <
@@ -35,9 +59,18 @@ export type DecodeStatusHandler = <TDecodeStatus extends SplitBBLStep>(
 export class PIDAnalyzer {
   private decoder: Decoder;
   private pythonAnalyzer: PythonAnalyzer;
-
-  public constructor(fileOrigin: string) {
-    this.pythonAnalyzer = new PythonAnalyzer(`${fileOrigin}/pid-analyzer`);
+  private readonly pythonAnalyzerOrigin: string;
+  private workerPool?: AnalyzerWorkerPool;
+  private profiling = { enabled: false, memory: false };
+
+  // with useResultCache, analyzed flights are kept in IndexedDB (up to 256 MB) and returned without analysis
+  // when opened again
+  public constructor(fileOrigin: string, useResultCache = false) {
+    this.pythonAnalyzerOrigin = `${fileOrigin}/pid-analyzer`;
+    this.pythonAnalyzer = new PythonAnalyzer(
+      this.pythonAnalyzerOrigin,
+      useResultCache
+    );
     this.decoder = new Decoder(`${fileOrigin}/blackbox-decoder`);
   }
 
@@ -76,18 +109,26 @@ export class PIDAnalyzer {
     return allCsvFiles;
   }
 
-  public async analyze(
+  // options (see PIDAnalyzerOptions) select the result format, decimation, throttle bands, precision,
+  // block reading and outputs of the analysis. resultFormat BINARY returns typed arrays instead of number[]
+  public async analyze<
+    TFormat extends PIDAnalyzerResultFormat = PIDAnalyzerResultFormat.JSON
+  >(
     decoderResults: DecoderResult[],
-    onStatus?: PIDAnalyzeStatusHandler
-  ): Promise<PIDAnalyzerResult[]> {
-    const results: PIDAnalyzerResult[] = [];
+    onStatus?: PIDAnalyzeStatusHandler,
+    options: PIDAnalyzerOptions<TFormat> = {}
+  ): Promise<PIDAnalyzerResult<PIDAnalyzerResultArray<TFormat>>[]> {
+    checkThrottleBands(options.throttleBands);
+    const results: PIDAnalyzerResult<PIDAnalyzerResultArray<TFormat>>[] = [];
 
     for (let index = 0; index < decoderResults.length; index++) {
       console.log(`Analyzing flight #${index}`);
 
       const result = await this.pythonAnalyzer
-        .analyzeOneFlight(decoderResults[index], (status, payload) =>
-          onStatus?.(status, index, payload)
+        .analyzeOneFlight(
+          decoderResults[index],
+          (status, payload) => onStatus?.(status, index, payload),
+          options
         )
         .catch((e) => {
           console.warn(`Analysis of flight ${index} failed`, e);
@@ -98,9 +139,101 @@ export class PIDAnalyzer {
         continue;
       }
 
-      results.push(result);
+      results.push(
+        result as PIDAnalyzerResult<PIDAnalyzerResultArray<TFormat>>
+      );
     }
 
     return results;
   }
+
+  // analysis of one flight that delivers every trace section by section (see PIDAnalyzerTraceSection) while it
+  // runs, so charts can be drawn before the whole flight is analyzed. the iterator returns the complete result,
+  // null if the analysis failed. options as for analyze
+  public analyzeProgressive<
+    TFormat extends PIDAnalyzerResultFormat = PIDAnalyzerResultFormat.JSON
+  >(
+    decoderResult: DecoderResult,
+    onStatus?: (status: AnalyzeOneFlightStep, payload: any) => any,
+    options: PIDAnalyzerOptions<TFormat> = {}
+  ): AsyncGenerator<
+    PIDAnalyzerTraceSection<PIDAnalyzerResultArray<TFormat>>,
+    PIDAnalyzerResult<PIDAnalyzerResultArray<TFormat>> | null
+  > {
+    checkThrottleBands(options.throttleBands);
+    return this.pythonAnalyzer.analyzeOneFlightProgressive(
+      decoderResult,
+      onStatus,
+      options
+    ) as AsyncGenerator<
+      PIDAnalyzerTraceSection<PIDAnalyzerResultArray<TFormat>>,
+      PIDAnalyzerResult<PIDAnalyzerResultArray<TFormat>> | null
+    >;
+  }
+
+  // like analyze, but flights run concurrently on a pool of web workers with one pyodide runtime each.
+  // workers are started on first use and kept for later batches (see terminateWorkers), status events
+  // of every flight keep their order. the result cache (useResultCache) is not used by the workers.
+  // a worker that crashes or takes longer than options.flightTimeout ms for a flight is replaced, the flight
+  // is dropped
+  public async analyzeBatch<
+    TFormat extends PIDAnalyzerResultFormat = PIDAnalyzerResultFormat.JSON
+  >(
+    decoderResults: DecoderResult[],
+    onStatus?: PIDAnalyzeStatusHandler,
+    options: PIDAnalyzerBatchOptions<TFormat> = {}
+  ): Promise<PIDAnalyzerResult<PIDAnalyzerResultArray<TFormat>>[]> {
+    checkThrottleBands(options.throttleBands);
+    const { workers, flightTimeout, ...analysisOptions } = options;
+    if (!this.workerPool) {
+      this.workerPool = new AnalyzerWorkerPool(
+        this.pythonAnalyzerOrigin,
+        workers
+      );
+      this.workerPool.setProfiling(
+        this.profiling.enabled,
+        this.profiling.memory
+      );
+    }
+
+    const results = await this.workerPool.analyze(
+      decoderResults,
+      (status, index, payload) => onStatus?.(status, index, payload),
+      analysisOptions,
+      flightTimeout
+    );
+
+    return results.filter(
+      (result) => !!result
+    ) as PIDAnalyzerResult<PIDAnalyzerResultArray<TFormat>>[];
+  }
+
+  // step responses of one flight for every combination of the analysis parameters in grid, e.g. to calibrate
+  // the thresholds for a class of quads. the log is read and transformed once for all of them
+  public async sweep(
+    decoderResult: DecoderResult,
+    grid: PIDAnalyzerSweepGrid,
+    onStatus?: (status: AnalyzeOneFlightStep, payload: any) => any,
+    precision: PIDAnalyzerPrecision = PIDAnalyzerPrecision.FLOAT64
+  ): Promise<PIDAnalyzerSweepResult | null> {
+    return this.pythonAnalyzer.sweepOneFlight(
+      decoderResult,
+      grid,
+      onStatus,
+      precision
+    );
+  }
+
+  // records wall time, cpu time and (with memory) peak allocations per analysis stage. the report comes with
+  // every result as profile, and for splitting as SplitBBLStep.PROFILE. memory tracing slows the analysis down
+  public async setProfiling(enabled: boolean, memory = true) {
+    this.profiling = { enabled, memory };
+    this.workerPool?.setProfiling(enabled, memory);
+    await this.pythonAnalyzer.setProfiling(enabled, memory);
+  }
+
+  public terminateWorkers() {
+    this.workerPool?.terminate();
+    this.workerPool = undefined;
+  }
 }
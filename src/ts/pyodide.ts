@@ -2,13 +2,15 @@ export type PyodideStatusListener = (status: string, payload?: any) => void;
 
 type MessageListener = (msg: string) => void;
 
+type LoadPyodide = (options: {
+  indexURL?: string;
+  stdout?: MessageListener;
+  stderr?: MessageListener;
+}) => Promise<any>;
+
 declare global {
   interface Window {
-    loadPyodide: (options: {
-      indexURL?: string;
-      stdout?: MessageListener;
-      stderr?: MessageListener;
-    }) => Promise<any>;
+    loadPyodide: LoadPyodide;
   }
 }
 
@@ -20,6 +22,8 @@ export class PyodideRuntime {
   private static debug = false;
   private static stderrListeners: MessageListener[] = [];
   private static onStatus: PyodideStatusListener | null = null;
+  private static loadedPackages: Record<string, Promise<any>> = {};
+  private static PACKAGE_LIB_DIR = "/pid-analyzer-lib";
 
   private static stdout(msg: string) {
     if (!PyodideRuntime.debug) {
@@ -57,17 +61,13 @@ export class PyodideRuntime {
     global: {
       micropip: "micropip-0.5.0-py3-none-any.whl",
     },
+    // the analysis only needs numpy. scipy (with openblas) is fetched by python on the first FLOAT32 analysis,
+    // for its single precision fft (see pid_analyzer/numeric.py), so it has to be hosted next to numpy
     main: {
       numpy: "numpy-1.26.1-cp311-cp311-emscripten_3_1_46_wasm32.whl",
-      pandas: "pandas-1.5.3-cp311-cp311-emscripten_3_1_46_wasm32.whl",
-      scipy: "scipy-1.11.2-cp311-cp311-emscripten_3_1_46_wasm32.whl",
     },
     sub: {
-      openblas: "openblas-0.3.23.zip",
       packaging: "packaging-23.1-py3-none-any.whl",
-      python_dateutil: "python_dateutil-2.8.2-py2.py3-none-any.whl",
-      pytz: "pytz-2023.3-py2.py3-none-any.whl",
-      six: "six-1.16.0-py2.py3-none-any.whl",
     },
   };
 
@@ -77,13 +77,20 @@ export class PyodideRuntime {
 
   private static async loadPyodide() {
     if (!PyodideRuntime.pyodide) {
-      if (!window.loadPyodide) {
-        await PyodideRuntime.loadPyodideViaScriptTag();
+      let loadPyodide: LoadPyodide | undefined = (globalThis as any).loadPyodide;
+      if (!loadPyodide) {
+        if (typeof document === "undefined") {
+          // web workers (see analyzer-worker.ts) have no document for a script tag, they import the module build
+          loadPyodide = await PyodideRuntime.importPyodideModule();
+        } else {
+          await PyodideRuntime.loadPyodideViaScriptTag();
+          loadPyodide = window.loadPyodide;
+        }
       }
 
       const indexURL = PyodideRuntime.fileOrigin;
 
-      PyodideRuntime.pyodide = await window.loadPyodide({
+      PyodideRuntime.pyodide = await loadPyodide({
         indexURL,
         // stdout: (msg) => PyodideRuntime.stdout(msg),
         // stderr: (msg) => PyodideRuntime.stderr(msg),
@@ -106,6 +113,13 @@ export class PyodideRuntime {
     return this.pyodide;
   }
 
+  private static async importPyodideModule(): Promise<LoadPyodide> {
+    const pyodideModuleUrl = `${this.fileOrigin}/pyodide.mjs`;
+    const pyodideModule = await import(/* webpackIgnore: true */ pyodideModuleUrl);
+
+    return pyodideModule.loadPyodide;
+  }
+
   private static async loadPyodideViaScriptTag() {
     const pyodideModuleUrl = `${this.fileOrigin}/pyodide.js`;
 
@@ -188,8 +202,103 @@ export class PyodideRuntime {
     return PyodideRuntime.getPyodide().FS;
   }
 
-  public async runAsync(code: string, onStatus?: PyodideStatusListener) {
-    if (PyodideRuntime.runningExecution) {
+  // installs a python package into the runtime and imports it, only once per package name
+  public async loadPackage(
+    name: string,
+    modules: { path: string; code: string }[]
+  ) {
+    if (!PyodideRuntime.loadedPackages[name]) {
+      PyodideRuntime.loadedPackages[name] = (async () => {
+        const pyodide = PyodideRuntime.getPyodide();
+        const libDir = PyodideRuntime.PACKAGE_LIB_DIR;
+
+        modules.forEach(({ path, code }) => {
+          const filePath = `${libDir}/${path}`;
+          pyodide.FS.mkdirTree(filePath.substring(0, filePath.lastIndexOf("/")));
+          pyodide.FS.writeFile(filePath, code);
+        });
+
+        await pyodide.runPythonAsync(
+          [
+            "import importlib, sys",
+            `if ${JSON.stringify(libDir)} not in sys.path:`,
+            `    sys.path.append(${JSON.stringify(libDir)})`,
+            "importlib.invalidate_caches()",
+          ].join("\n")
+        );
+
+        return pyodide.pyimport(name);
+      })();
+    }
+
+    return PyodideRuntime.loadedPackages[name];
+  }
+
+  // creates a directory that outlives the page, backed by IndexedDB (IDBFS) where available.
+  // without IndexedDB it is a plain in-memory directory for the lifetime of the runtime
+  public async mountPersistentDirectory(path: string) {
+    const pyodide = PyodideRuntime.getPyodide();
+    if (pyodide.FS.analyzePath(path).exists) {
+      return;
+    }
+
+    pyodide.FS.mkdirTree(path);
+    if (typeof indexedDB === "undefined") {
+      return;
+    }
+
+    pyodide.FS.mount(pyodide.FS.filesystems.IDBFS, {}, path);
+    await PyodideRuntime.syncFS(true);
+  }
+
+  // writes changes of persistent directories (see mountPersistentDirectory) to IndexedDB
+  public async persistDirectories() {
+    if (typeof indexedDB === "undefined") {
+      return;
+    }
+
+    await PyodideRuntime.syncFS(false);
+  }
+
+  private static syncFS(populate: boolean) {
+    return new Promise<void>((resolve, reject) => {
+      PyodideRuntime.getPyodide().FS.syncfs(populate, (error: any) =>
+        error ? reject(error) : resolve()
+      );
+    });
+  }
+
+  // calls a (async) function of a package loaded by loadPackage, arguments are converted to python objects.
+  // resolves with the return value of the function (a PyProxy for non-primitive values, to be destroyed by the caller)
+  public async callAsync(
+    packageName: string,
+    functionName: string,
+    args: any[],
+    onStatus?: PyodideStatusListener
+  ): Promise<any> {
+    const pythonPackage = await PyodideRuntime.loadedPackages[packageName];
+    if (!pythonPackage) {
+      throw new Error(`Please load package ${packageName} first`);
+    }
+
+    return this.execute(async (pyodide) => {
+      const pythonArgs = args.map((arg) => pyodide.toPy(arg));
+      const fn = pythonPackage[functionName];
+      try {
+        return await fn(...pythonArgs);
+      } finally {
+        fn.destroy();
+        pythonArgs.forEach((arg) => arg?.destroy?.());
+      }
+    }, onStatus);
+  }
+
+  // runs one execution at a time, status reports of python go to onStatus while it runs
+  private async execute<T>(
+    run: (pyodide: any) => Promise<T>,
+    onStatus?: PyodideStatusListener
+  ): Promise<T | undefined> {
+    while (PyodideRuntime.runningExecution) {
       await PyodideRuntime.runningExecution;
     }
 
@@ -198,21 +307,18 @@ export class PyodideRuntime {
       (resolve) => (resolveCurrentExecution = resolve)
     );
 
-    const pyodide = PyodideRuntime.getPyodide();
-    const dict = pyodide.globals.get("dict");
-    const globals = dict();
     try {
       PyodideRuntime.onStatus = (status, payload) => {
         onStatus?.(status, payload);
       };
 
-      await pyodide.runPythonAsync(code, { globals, locals: globals });
+      return await run(PyodideRuntime.getPyodide());
     } catch (e) {
       console.error("Error while running python code", e);
+      return undefined;
     } finally {
       PyodideRuntime.onStatus = null;
-      globals.destroy();
-      dict.destroy();
+      PyodideRuntime.runningExecution = null;
       resolveCurrentExecution!();
     }
   }
@@ -1,101 +1,280 @@
-import { PYTHON_ANALYZER_CODE_NAMES, loadCode } from "./code-loader";
+import { PID_ANALYZER_PACKAGE_MODULES, loadCode } from "./code-loader";
 import { PyodideRuntime, PyodideStatusListener } from "./pyodide";
 import {
   AnalyzeOneFlightStep,
   DecoderResult,
+  PIDAnalyzerArray,
   PIDAnalyzerHeaderInformation,
+  PIDAnalyzerOptions,
+  PIDAnalyzerPrecision,
   PIDAnalyzerResult,
+  PIDAnalyzerResultFormat,
+  PIDAnalyzerSweepGrid,
+  PIDAnalyzerSweepResult,
+  PIDAnalyzerTraceSection,
+  PIDAnalyzerTraceSectionName,
   SplitBBLStep,
 } from "./types";
 
+// outputs of a trace by section, as in Trace.SECTIONS of the python side
+const TRACE_SECTIONS: Record<PIDAnalyzerTraceSectionName, string[]> = {
+  series: ["gyro", "input", "time", "throttle", "feedforward"],
+  response: [
+    "time_resp",
+    "resp_low",
+    "high_mask",
+    "delay",
+    "resp_high",
+    "resp_throttle",
+  ],
+  noise: ["noise_gyro", "noise_d", "noise_debug"],
+};
+
 interface SplitterResult {
   header: PIDAnalyzerHeaderInformation;
-  bbl_filename: string;
+  offset: number;
+  length: number;
+}
+
+// results of async_analyze_flight without result_path, the json (manifest) and binary data per result name
+type AnalyzerResults = Record<string, { json: string; bin?: Uint8Array }>;
+
+interface BinaryArrayDescriptor {
+  __ndarray__: "float64" | "float32";
+  shape: number[];
+  offset: number;
 }
 
+const TYPED_ARRAYS = {
+  float64: Float64Array,
+  float32: Float32Array,
+};
+
+// replaces the array descriptors of a binary result manifest with typed array views into buffer
+function mapBinaryResult(manifest: any, buffer: ArrayBufferLike): any {
+  if (manifest === null || typeof manifest !== "object") {
+    return manifest;
+  }
+
+  if ("__ndarray__" in manifest) {
+    const { __ndarray__: dtype, shape, offset } =
+      manifest as BinaryArrayDescriptor;
+    const TypedArray = TYPED_ARRAYS[dtype];
+    if (!TypedArray) {
+      throw new Error(`Unsupported result dtype: ${dtype}`);
+    }
+
+    if (shape.length === 1) {
+      return new TypedArray(buffer, offset, shape[0]);
+    }
+
+    const rowLength = shape.slice(1).reduce((a, b) => a * b, 1);
+    return Array.from(
+      { length: shape[0] },
+      (_, row) =>
+        new TypedArray(
+          buffer,
+          offset + row * rowLength * TypedArray.BYTES_PER_ELEMENT,
+          rowLength
+        )
+    );
+  }
+
+  const result: Record<string, any> = {};
+  Object.entries(manifest).forEach(([key, value]) => {
+    result[key] = mapBinaryResult(value, buffer);
+  });
+  return result;
+}
+
+// converts a python result (dicts, lists, bytes) into plain js objects and releases the proxy
+// throws like Trace.resolve_throttle_bands of the python side unless the band edges are at least 2,
+// strictly increasing and within 0 and 100 %
+export function checkThrottleBands(throttleBands?: number[]) {
+  if (throttleBands === undefined) {
+    return;
+  }
+  const valid =
+    throttleBands.length >= 2 &&
+    throttleBands.every(
+      (edge, index) =>
+        edge >= 0 &&
+        edge <= 100 &&
+        (index === 0 || edge > throttleBands[index - 1])
+    );
+  if (!valid) {
+    throw new RangeError(
+      `throttleBands must be at least 2 increasing edges within 0 and 100, not [${throttleBands}]`
+    );
+  }
+}
+
+// json result, or for binary data its manifest with typed array views into the data
+function decodeResult({ json, bin }: { json: string; bin?: Uint8Array }): any {
+  if (!bin) {
+    return JSON.parse(json);
+  }
+
+  // typed array views need an aligned buffer of their own
+  const buffer =
+    bin.byteOffset === 0 && bin.byteLength === bin.buffer.byteLength
+      ? bin.buffer
+      : bin.slice().buffer;
+  return mapBinaryResult(JSON.parse(json), buffer);
+}
+
+function toJsObject<T>(result: any): T | undefined {
+  if (!result?.toJs) {
+    return result ?? undefined;
+  }
+
+  try {
+    return result.toJs({ dict_converter: Object.fromEntries }) as T;
+  } finally {
+    result.destroy();
+  }
+}
+
+// analyzed flights are cached here by the content of their csv (see pid_analyzer/cache.py)
+const RESULT_CACHE_DIR = "/pid-analyzer-cache";
+
 export class PythonAnalyzer {
   private readonly pyodideRuntime: PyodideRuntime;
+  private readonly useResultCache: boolean;
+  private analyzerPackage?: Promise<any>;
 
-  public constructor(fileOrigin?: string) {
+  public constructor(fileOrigin?: string, useResultCache = false) {
     PyodideRuntime.setFileOrigin(fileOrigin);
     this.pyodideRuntime = new PyodideRuntime();
+    this.useResultCache = useResultCache;
   }
 
   public async init(): Promise<void> {
     await PyodideRuntime.init();
+    await this.loadAnalyzerPackage();
+  }
+
+  // the analyzer package is installed and imported once, every flight only calls into it
+  private async loadAnalyzerPackage() {
+    if (!this.analyzerPackage) {
+      this.analyzerPackage = (async () => {
+        const modules = await Promise.all(
+          PID_ANALYZER_PACKAGE_MODULES.map(async (path) => ({
+            path,
+            code: await loadCode(path),
+          }))
+        );
+
+        const analyzerPackage = await this.pyodideRuntime.loadPackage(
+          "pid_analyzer",
+          modules
+        );
+        if (this.useResultCache) {
+          await this.pyodideRuntime.mountPersistentDirectory(RESULT_CACHE_DIR);
+        }
+
+        return analyzerPackage;
+      })();
+    }
+
+    return this.analyzerPackage;
+  }
+
+  // switches the stage profiler of the python side, see PIDAnalyzerProfile
+  public async setProfiling(enabled: boolean, memory = true) {
+    await this.loadAnalyzerPackage();
+    await this.pyodideRuntime.callAsync("pid_analyzer", "set_profiling", [
+      enabled,
+      memory,
+    ]);
   }
 
   public async splitMainBBLIntoSubBBL(
     logFile: ArrayBuffer,
     onStatus?: (status: SplitBBLStep, payload: any) => any
-  ): Promise<{ header: PIDAnalyzerHeaderInformation; bbl: ArrayBuffer }[]> {
-    const code = await loadCode(PYTHON_ANALYZER_CODE_NAMES.SPLIT_BBL);
-
-    await this.pyodideRuntime.FS.writeFile("/log.bbl", new Uint8Array(logFile));
-    await this.pyodideRuntime.runAsync(code, (status, payload) => {
-      onStatus?.(status as SplitBBLStep, payload);
-    });
-
-    const result = await this.pyodideRuntime.FS.readFile("/result.json", {
-      encoding: "utf8",
-    });
-    const resultJson = JSON.parse(result) as SplitterResult[];
-
-    const resultsWithSubBBLS = await Promise.all(
-      resultJson.map(async (splitterResult) => {
-        const subBblFile = await this.pyodideRuntime.FS.readFile(
-          splitterResult.bbl_filename,
-          {
-            encoding: "binary",
-          }
-        );
+  ): Promise<{ header: PIDAnalyzerHeaderInformation; bbl: Uint8Array }[]> {
+    await this.loadAnalyzerPackage();
 
-        return {
-          header: splitterResult.header,
-          bbl: subBblFile,
-        };
-      })
+    const result = await this.pyodideRuntime.callAsync(
+      "pid_analyzer",
+      "async_split_bbl_buffer",
+      [new Uint8Array(logFile)],
+      (status, payload) => {
+        if (status === SplitBBLStep.PROFILE) {
+          payload = JSON.parse(payload);
+        }
+        onStatus?.(status as SplitBBLStep, payload);
+      }
     );
+    const splitterResults = toJsObject<SplitterResult[]>(result) ?? [];
 
-    return resultsWithSubBBLS;
+    // the sub bbls are views into the original log, nothing is copied
+    return splitterResults.map(({ header, offset, length }) => ({
+      header,
+      bbl: new Uint8Array(logFile, offset, length),
+    }));
   }
 
+  // with onSection python reports every trace section by section while analyzing (see
+  // analyzeOneFlightProgressive), the traces of the result are then put together from these sections
   public async analyzeOneFlight(
     decoderResult: DecoderResult,
-    onStatus?: (status: AnalyzeOneFlightStep, payload: any) => any
-  ): Promise<PIDAnalyzerResult | null> {
-    const code = await loadCode(PYTHON_ANALYZER_CODE_NAMES.ANALYZE_ONE_FLIGHT);
-
-    await this.pyodideRuntime.FS.writeFile("/log.csv", decoderResult.csv);
-    await this.pyodideRuntime.FS.writeFile(
-      "/log-header.json",
-      JSON.stringify(decoderResult.header)
-    );
+    onStatus?: (status: AnalyzeOneFlightStep, payload: any) => any,
+    options: PIDAnalyzerOptions = {},
+    onSection?: (section: PIDAnalyzerTraceSection<PIDAnalyzerArray>) => any
+  ): Promise<PIDAnalyzerResult<PIDAnalyzerArray> | null> {
+    await this.loadAnalyzerPackage();
 
+    // sections reported so far per axis, python leaves them out of the final traces
+    const streamed: Record<string, Record<string, any>> = {};
     let failure = false;
+    let results: AnalyzerResults | undefined;
     try {
-      await this.pyodideRuntime.runAsync(code, (status, payload) => {
-        if (status === "ERROR") {
-          failure = payload ?? true;
+      const result = await this.pyodideRuntime.callAsync(
+        "pid_analyzer",
+        "async_analyze_flight",
+        [
+          new TextEncoder().encode(decoderResult.csv),
+          decoderResult.header,
+          null,
+          options.resultFormat ?? PIDAnalyzerResultFormat.JSON,
+          this.useResultCache ? RESULT_CACHE_DIR : null,
+          options.maxPoints ?? null,
+          options.throttleBands ?? null,
+          options.precision ?? PIDAnalyzerPrecision.FLOAT64,
+          options.chunkRows ?? null,
+          options.outputs ?? null,
+          onSection !== undefined,
+        ],
+        (status, payload) => {
+          if (status === "ERROR") {
+            failure = payload ?? true;
+          }
+          if (status === "ANALYZE_PID_TRACE_RESULT") {
+            const [axis, section, json, bin] = payload;
+            const data = decodeResult({ json, bin });
+            streamed[axis] = { ...streamed[axis], ...data };
+            onSection?.({ axis, section, data });
+          }
+          onStatus?.(status as AnalyzeOneFlightStep, payload);
         }
-        onStatus?.(status as AnalyzeOneFlightStep, payload);
-      });
+      );
+      results = toJsObject<AnalyzerResults>(result);
     } catch (e) {
       // console.error(e);
       failure = true;
     }
 
-    if (failure) {
+    if (failure || !results) {
       return null;
     }
 
-    const headdictContent = this.pyodideRuntime.FS.readFile(
-      `/results/headdict.json`,
-      {
-        encoding: "utf8",
-      }
-    );
-    const headdict = JSON.parse(headdictContent);
+    // after hits too, they mark their entry as recently used (see DirectoryStore.get) for the eviction
+    if (this.useResultCache) {
+      await this.pyodideRuntime.persistDirectories();
+    }
+
+    const headdict = JSON.parse(results.headdict.json);
     Object.entries(headdict).forEach(([key, value]) => {
       if (key.startsWith("simplified_")) {
         if (typeof value !== "string") {
@@ -112,23 +291,129 @@ export class PythonAnalyzer {
     });
 
     const axis = ["roll", "pitch", "yaw"];
-    const [roll, pitch, yaw] = await Promise.all(
-      axis.map(async (a) => {
-        const data = this.pyodideRuntime.FS.readFile(
-          `/results/trace_${a}.json`,
-          {
-            encoding: "utf8",
-          }
-        );
-        return JSON.parse(data);
-      })
-    );
+    const [roll, pitch, yaw] = axis.map((a) => ({
+      ...streamed[a],
+      ...decodeResult(results![`trace_${a}`]),
+    }));
 
     return {
       headdict,
       roll,
       pitch,
       yaw,
-    } as PIDAnalyzerResult;
+      ...(results.profile && { profile: JSON.parse(results.profile.json) }),
+    } as PIDAnalyzerResult<PIDAnalyzerArray>;
+  }
+
+  // analyzeOneFlight that yields the sections of every trace as soon as they are analyzed and returns the
+  // complete result (null on failure). sections of cached results are yielded from the complete result
+  public async *analyzeOneFlightProgressive(
+    decoderResult: DecoderResult,
+    onStatus?: (status: AnalyzeOneFlightStep, payload: any) => any,
+    options: PIDAnalyzerOptions = {}
+  ): AsyncGenerator<
+    PIDAnalyzerTraceSection<PIDAnalyzerArray>,
+    PIDAnalyzerResult<PIDAnalyzerArray> | null
+  > {
+    const pending: PIDAnalyzerTraceSection<PIDAnalyzerArray>[] = [];
+    const streamed = new Set<string>();
+    let wake: (() => void) | undefined;
+    let done = false;
+
+    const analysis = this.analyzeOneFlight(
+      decoderResult,
+      onStatus,
+      options,
+      (section) => {
+        pending.push(section);
+        streamed.add(`${section.axis}/${section.section}`);
+        wake?.();
+      }
+    ).finally(() => {
+      done = true;
+      wake?.();
+    });
+
+    while (pending.length > 0 || !done) {
+      if (pending.length === 0) {
+        await new Promise<void>((resolve) => (wake = resolve));
+        wake = undefined;
+        continue;
+      }
+      yield pending.shift()!;
+    }
+
+    const result = await analysis;
+    if (!result) {
+      return null;
+    }
+
+    // sections python did not report, e.g. of a cached result
+    for (const axis of ["roll", "pitch", "yaw"] as const) {
+      const trace: Record<string, any> = result[axis];
+      for (const [section, names] of Object.entries(TRACE_SECTIONS)) {
+        if (streamed.has(`${axis}/${section}`)) {
+          continue;
+        }
+        const fields = names.filter((name) => name in trace);
+        if (fields.length === 0) {
+          continue;
+        }
+        yield {
+          axis,
+          section: section as PIDAnalyzerTraceSectionName,
+          data: Object.fromEntries(
+            fields.map((name) => [name, trace[name]])
+          ),
+        };
+      }
+    }
+
+    return result;
+  }
+
+  public async sweepOneFlight(
+    decoderResult: DecoderResult,
+    grid: PIDAnalyzerSweepGrid,
+    onStatus?: (status: AnalyzeOneFlightStep, payload: any) => any,
+    precision: PIDAnalyzerPrecision = PIDAnalyzerPrecision.FLOAT64
+  ): Promise<PIDAnalyzerSweepResult | null> {
+    await this.loadAnalyzerPackage();
+
+    let failure = false;
+    let results: AnalyzerResults | undefined;
+    try {
+      const result = await this.pyodideRuntime.callAsync(
+        "pid_analyzer",
+        "async_sweep_flight",
+        [
+          new TextEncoder().encode(decoderResult.csv),
+          decoderResult.header,
+          grid.cutfreq ?? null,
+          grid.resplen ?? null,
+          grid.threshold ?? null,
+          grid.toolow_threshold ?? null,
+          precision,
+        ],
+        (status, payload) => {
+          if (status === "ERROR") {
+            failure = payload ?? true;
+          }
+          onStatus?.(status as AnalyzeOneFlightStep, payload);
+        }
+      );
+      results = toJsObject<AnalyzerResults>(result);
+    } catch (e) {
+      failure = true;
+    }
+
+    if (failure || !results) {
+      return null;
+    }
+
+    return {
+      ...JSON.parse(results.sweep.json),
+      ...(results.profile && { profile: JSON.parse(results.profile.json) }),
+    } as PIDAnalyzerSweepResult;
   }
 }
@@ -20,23 +20,117 @@ export interface PIDAnalyzerHeaderInformation {
   simplified_pitch_pi_gain?: number | null;
 }
 
-export interface PIDAnalyzerTraceNoiseData {
+/**
+ * numeric arrays of a result are plain arrays for PIDAnalyzerResultFormat.JSON (the default)
+ * and typed arrays (views into the result buffer) for PIDAnalyzerResultFormat.BINARY
+ */
+export type PIDAnalyzerArray = number[] | Float64Array | Float32Array;
+
+export enum PIDAnalyzerResultFormat {
+  JSON = "json",
+  BINARY = "binary",
+}
+
+// array type of results in the format TFormat, see PIDAnalyzerArray
+export type PIDAnalyzerResultArray<
+  TFormat extends PIDAnalyzerResultFormat = PIDAnalyzerResultFormat.JSON
+> = TFormat extends PIDAnalyzerResultFormat.BINARY
+  ? Float64Array | Float32Array
+  : number[];
+
+/**
+ * precision of the analysis. FLOAT32 needs half the memory and is faster, results differ from
+ * FLOAT64 by less than 1e-3 of their range. binary results then come as Float32Array (time stays Float64Array)
+ */
+export enum PIDAnalyzerPrecision {
+  FLOAT64 = "float64",
+  FLOAT32 = "float32",
+}
+
+/**
+ * results of a trace the analysis can be restricted to, only the stages they need are run.
+ * e.g. ["noise_gyro", "noise_d", "noise_debug"] for the noise spectra only, skipping the step responses
+ */
+export type PIDAnalyzerOutput =
+  | "gyro"
+  | "input"
+  | "time"
+  | "throttle"
+  | "feedforward"
+  | "time_resp"
+  | "resp_low"
+  | "high_mask"
+  | "noise_gyro"
+  | "noise_d"
+  | "noise_debug"
+  | "delay"
+  | "resp_high"
+  | "resp_throttle";
+
+// options of PIDAnalyzer.analyze, all of them can be left out
+export interface PIDAnalyzerOptions<
+  TFormat extends PIDAnalyzerResultFormat = PIDAnalyzerResultFormat
+> {
+  // JSON (default) for number[], BINARY for typed arrays, faster and smaller for long logs
+  resultFormat?: TFormat;
+  // decimates the time series (gyro, input, time, throttle, feedforward) to about the number of points
+  // a chart can show, min and max of every bucket are kept. full resolution without it
+  maxPoints?: number;
+  // band edges in % (at least 2, increasing, within 0 and 100, e.g. [0, 25, 50, 75, 100]),
+  // adds step responses per throttle band (resp_throttle). other edges are rejected with a RangeError
+  throttleBands?: number[];
+  // FLOAT32 halves the memory of the analysis, for long logs on memory constrained devices. FLOAT64 by default
+  precision?: PIDAnalyzerPrecision;
+  // reads and analyzes every log in blocks of that many rows (e.g. 100000), memory then stays
+  // bounded for any flight length as long as maxPoints is set too
+  chunkRows?: number;
+  // restricts every trace to these results and the analysis to what they need, all of them without it
+  outputs?: PIDAnalyzerOutput[];
+}
+
+// options of PIDAnalyzer.analyzeBatch
+export interface PIDAnalyzerBatchOptions<
+  TFormat extends PIDAnalyzerResultFormat = PIDAnalyzerResultFormat
+> extends PIDAnalyzerOptions<TFormat> {
+  // size of the worker pool, taken when the pool is started by the first batch
+  workers?: number;
+  // ms a flight may take before its worker is replaced and the flight dropped, no limit without it
+  flightTimeout?: number;
+}
+
+export interface PIDAnalyzerTraceNoiseData<
+  TArray extends PIDAnalyzerArray = number[]
+> {
   throt_hist_avr: number[];
   throt_axis: number[];
-  freq_axis: number[];
+  freq_axis: TArray;
   hist2d_norm: number[];
-  hist2d_sm: number[][];
+  hist2d_sm: TArray[];
   hist2d: number[];
   max: number;
 }
 
-export interface PIDAnalyzerTraceData {
+export interface PIDAnalyzerThrottleResponse<
+  TArray extends PIDAnalyzerArray = number[]
+> {
+  // band edges in %, band i reaches from bands[i] to bands[i + 1]
+  bands: TArray;
+  // step response per band, rows along time_resp
+  resp: TArray[];
+  // number of windows per band, bands without windows have a zero response
+  windows: TArray;
+}
+
+// with outputs (see PIDAnalyzerOutput) a trace only has the selected fields
+export interface PIDAnalyzerTraceData<
+  TArray extends PIDAnalyzerArray = number[]
+> {
   name: string;
-  gyro: number[];
-  input: number[];
-  feedforward: number[];
-  time: number[];
-  throttle: number[];
+  gyro: TArray;
+  input: TArray;
+  feedforward: TArray;
+  time: TArray;
+  throttle: TArray;
   avr_t: number[];
   spec_sm: number[];
   thr_response: {
@@ -45,12 +139,14 @@ export interface PIDAnalyzerTraceData {
       bins: number[];
     };
   };
-  time_resp: number[];
-  resp_low: number[];
-  high_mask: number[];
-  noise_gyro: PIDAnalyzerTraceNoiseData;
-  noise_d: PIDAnalyzerTraceNoiseData;
-  noise_debug: PIDAnalyzerTraceNoiseData;
+  time_resp: TArray;
+  resp_low: TArray;
+  resp_high?: TArray;
+  resp_throttle?: PIDAnalyzerThrottleResponse<TArray>;
+  high_mask: TArray;
+  noise_gyro: PIDAnalyzerTraceNoiseData<TArray>;
+  noise_d: PIDAnalyzerTraceNoiseData<TArray>;
+  noise_debug: PIDAnalyzerTraceNoiseData<TArray>;
   filter_trans: number[];
   delay: {
     latency_half_height: number;
@@ -60,11 +156,78 @@ export interface PIDAnalyzerTraceData {
   };
 }
 
-export interface PIDAnalyzerResult {
-  roll: PIDAnalyzerTraceData;
-  pitch: PIDAnalyzerTraceData;
-  yaw: PIDAnalyzerTraceData;
+// sections a trace is delivered in by PIDAnalyzer.analyzeProgressive, in the order they are computed:
+// series (gyro, input, time, throttle, feedforward), response (time_resp, resp_low, high_mask, delay,
+// resp_high, resp_throttle) and noise (noise_gyro, noise_d, noise_debug)
+export type PIDAnalyzerTraceSectionName = "series" | "response" | "noise";
+
+export interface PIDAnalyzerTraceSection<
+  TArray extends PIDAnalyzerArray = number[]
+> {
+  axis: "roll" | "pitch" | "yaw";
+  section: PIDAnalyzerTraceSectionName;
+  // the fields of the section, as they are in the final PIDAnalyzerTraceData
+  data: Partial<PIDAnalyzerTraceData<TArray>>;
+}
+
+export interface PIDAnalyzerProfileStage {
+  // seconds
+  wall: number;
+  cpu: number;
+  // bytes allocated on top of the start of the stage, 0 without memory profiling
+  peak_bytes: number;
+}
+
+// stage report of the profiler (see PIDAnalyzer.setProfiling), stages are e.g. split, header, read_csv,
+// equalize, winstacker, deconvolution, weighted_mode_avr, stackspectrum, export and flight
+export interface PIDAnalyzerProfile {
+  memory: boolean;
+  stages: Record<string, PIDAnalyzerProfileStage & { calls: number }>;
+  records: (PIDAnalyzerProfileStage & { stage: string; thread: string })[];
+}
+
+// arrays are number[] for PIDAnalyzerResultFormat.JSON, see PIDAnalyzerResultArray for other formats
+export interface PIDAnalyzerResult<
+  TArray extends PIDAnalyzerArray = number[]
+> {
+  roll: PIDAnalyzerTraceData<TArray>;
+  pitch: PIDAnalyzerTraceData<TArray>;
+  yaw: PIDAnalyzerTraceData<TArray>;
   headdict: PIDAnalyzerHeaderInformation;
+  profile?: PIDAnalyzerProfile;
+}
+
+// values of the analysis parameters to sweep (see PIDAnalyzer.sweep), the default of the analysis for the ones left out
+export interface PIDAnalyzerSweepGrid {
+  // Hz, cut frequency of what is considered as input
+  cutfreq?: number[];
+  // s, length of the step response, at most the 1 s windows
+  resplen?: number[];
+  // input rate above which windows count as high input (resp_high)
+  threshold?: number[];
+  // input rate below which windows are too noisy for a step response
+  toolow_threshold?: number[];
+}
+
+export interface PIDAnalyzerSweepVariant {
+  cutfreq: number;
+  resplen: number;
+  threshold: number;
+  toolow_threshold: number;
+  time_resp: number[];
+  resp_low: number[];
+  resp_high?: number[];
+  delay: PIDAnalyzerTraceData["delay"];
+  // number of windows behind resp_low and resp_high
+  windows: { low: number; high: number };
+}
+
+// one variant per combination of the grid values
+export interface PIDAnalyzerSweepResult {
+  roll: PIDAnalyzerSweepVariant[];
+  pitch: PIDAnalyzerSweepVariant[];
+  yaw: PIDAnalyzerSweepVariant[];
+  profile?: PIDAnalyzerProfile;
 }
 
 export interface DecoderResult {
@@ -78,9 +241,11 @@ export enum AnalyzeOneFlightStep {
   ANALYZE_PID_START = "ANALYZE_PID_START",
   ANALYZE_PID_TRACE_START = "ANALYZE_PID_TRACE_START",
   ANALYZE_PID_TRACE_COMPLETE = "ANALYZE_PID_TRACE_COMPLETE",
+  ANALYZE_PID_TRACE_RESULT = "ANALYZE_PID_TRACE_RESULT",
   ANALYZE_PID_COMPLETE = "ANALYZE_PID_COMPLETE",
   READING_CSV_START = "READING_CSV_START",
   READING_CSV_COMPLETE = "READING_CSV_COMPLETE",
+  CACHE_HIT = "CACHE_HIT",
   START = "START",
   COMPLETE = "COMPLETE",
   ERROR = "ERROR",
@@ -94,7 +259,15 @@ export type AnalyzeOneFlightStepToPayloadMap = {
   [AnalyzeOneFlightStep.ANALYZE_PID_START]: undefined;
   [AnalyzeOneFlightStep.ANALYZE_PID_TRACE_START]: "roll" | "pitch" | "yaw";
   [AnalyzeOneFlightStep.ANALYZE_PID_TRACE_COMPLETE]: "roll" | "pitch" | "yaw";
+  // axis, section, json (manifest for PIDAnalyzerResultFormat.BINARY) and binary data of a section
+  [AnalyzeOneFlightStep.ANALYZE_PID_TRACE_RESULT]: [
+    "roll" | "pitch" | "yaw",
+    PIDAnalyzerTraceSectionName,
+    string,
+    Uint8Array | undefined
+  ];
   [AnalyzeOneFlightStep.ANALYZE_PID_COMPLETE]: undefined;
+  [AnalyzeOneFlightStep.CACHE_HIT]: string;
   [AnalyzeOneFlightStep.COMPLETE]: undefined;
   [AnalyzeOneFlightStep.ERROR]: string;
 };
@@ -109,6 +282,7 @@ export enum SplitBBLStep {
   READING_HEADERS_FROM_SUB_BBL_COMPLETE = "READING_HEADERS_FROM_SUB_BBL_COMPLETE",
   READING_HEADERS_COMPLETE = "READING_HEADERS_COMPLETE",
   RUNNING = "RUNNING",
+  PROFILE = "PROFILE",
   COMPLETE = "COMPLETE",
 }
 
@@ -122,5 +296,6 @@ export type SplitBBLStepToPayloadMap = {
   [SplitBBLStep.READING_HEADERS_FROM_SUB_BBL_START]: number;
   [SplitBBLStep.READING_HEADERS_FROM_SUB_BBL_COMPLETE]: number;
   [SplitBBLStep.READING_HEADERS_COMPLETE]: undefined;
+  [SplitBBLStep.PROFILE]: PIDAnalyzerProfile;
   [SplitBBLStep.COMPLETE]: undefined;
 };